@@ -11,26 +11,35 @@
 # Licence:     MIT
 #-------------------------------------------------------------------------
 
-from copy import deepcopy
 from pprint import pformat
 from operator import attrgetter
+from collections import OrderedDict
+from itertools import chain
+from copy import copy
+from math import isnan, ceil
+from time import time
 import sys
+import weakref
 
 import multiprocessing
 from threading import Thread
 from Queue import Queue
 
-from shapeops import num_useful_rotations, Pieces
+from shapeops import get_shape_catalog
+from bitboard import BitBoard
+import batch
 
-useful_rotations = {}
-""" Associate rotations with piece IDs - calculated once """
+useful_rotations = get_shape_catalog().useful_rotations
+""" Associate rotations with piece IDs - from the shape catalog """
 
 
 class Weightings(object):
 
     """Hold weights associated with each aspect of the cost function.
 
-    Also used to hold information used throughout the solving process.
+    Also used to hold the settings of the solver, and information used
+    throughout the solving process. Any of these may be given as keyword
+    arguments, e.g. Weightings(backend='numpy', lookahead_distance=4)
     """
 
     bignum = sys.maxint
@@ -67,6 +76,86 @@ class Weightings(object):
     max_num_branches = 3
     """ The maximum number of branches at each step """
 
+    solver = 'tree'
+    """ Search a tree of Steps with 'tree', or use 'beam' search - see
+    solvers """
+
+    backend = 'threads'
+    """ Evaluate moves using 'threads', 'processes' or 'numpy' - see
+    evaluators """
+
+    num_workers = None
+    """ The number of workers evaluating moves, defaults to the number of
+    CPUs """
+
+    use_transposition_table = True
+    """ Whether Steps reaching a board already explored reuse its result """
+
+    transpositions = None
+    """ The TranspositionTable in use, if any """
+
+    move_cache_size = 20000
+    """ The number of move stats remembered between search windows.
+    0 disables the cache """
+
+    move_cache = None
+    """ The MoveCache in use, if any """
+
+    beam_width = 8
+    """ The number of games kept at each depth by the beam solver """
+
+    branch_and_bound = False
+    """ Whether to search every move, cutting only subtrees whose lower
+    bound can't beat the best end node found. Finds the cheapest moves in
+    each window under the weightings, but takes longer """
+
+    merge_duplicates = None
+    """ Whether moves giving the same game as another move are dropped.
+    None merges only for the beam solver, whose nodes often reach the same
+    game - a tree's Steps rarely do, as useful_rotations already drops
+    symmetric rotations """
+
+    merged_moves = 0
+    """ The number of duplicate moves dropped """
+
+    reuse_tree = True
+    """ Whether each window keeps the Steps searched by the previous
+    window, below the move made """
+
+    prune_subtrees = False
+    """ Whether each Step keeps only its best child, freeing the others
+    (and their boards) as soon as their costs are known. Bounds the memory
+    used by the tree, but means it can't be reused by the next window """
+
+    print_stats = False
+    """ Whether to print statistics of the search as it goes, such as the
+    most Steps held while searching each window. Always printed when
+    pruning subtrees """
+
+    step_counter = None
+    """ The StepCounter counting the Steps of the tree search. One given
+    here is shared with the caller, otherwise one is made when the counts
+    are printed """
+
+    time_per_move = None
+    """ Seconds to spend searching for each move, deepening the lookahead
+    one piece at a time. None searches to lookahead_distance regardless """
+
+    deadline = None
+    """ Seconds in which to find every move, shared between the pieces
+    left, or None """
+
+    deadline_time = None
+    """ Time by which every move must be found, worked out from deadline
+    when solving starts """
+
+    def __init__(self, **settings):
+        for name, value in settings.items():
+            if not hasattr(Weightings, name):
+                raise TypeError("Unknown setting {}".format(name))
+
+            setattr(self, name, value)
+
     def skip_move(self, depth, cost):
         """ Whether to skip exploring the subsequent moves for a given cost
         and depth.
@@ -87,6 +176,10 @@ class Weightings(object):
 
         return not best <= cost <= max_cost
 
+    def vector(self):
+        """ The weight of each move stat, in the order of batch.features """
+        return [getattr(self, name) for name in batch.features]
+
     def __str__(self):
         return """
 area          {0.area:.2f}
@@ -98,6 +191,118 @@ centroidy     {0.centroidy:.2f}
 """.format(self)
 
 
+class TranspositionTable(object):
+
+    """Remember the best child and cost found below each game state, so a
+    Step reaching the same state again can reuse them.
+
+    Keys are made from the board, the centroid of the last piece placed, the
+    depth and the pieces left to place. Costs are stored relative to the
+    cost of reaching the state.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """ Return (best_child, relative_cost) for key, or None """
+        entry = self.entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return entry
+
+    def store(self, key, best_child, relative_cost):
+        self.entries[key] = (best_child, relative_cost)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def clear(self):
+        self.entries.clear()
+
+    def __str__(self):
+        return "Transposition table: {0.hits} hits, {0.misses} misses".format(self)
+
+
+class MoveCache(object):
+
+    """Remember the Stats of placements already tried, so later search
+    windows don't drop the same piece onto the same board again.
+
+    Keys are made from the board, the piece number, its rotation and where
+    it is dropped. Once full, the least recently used stats are evicted.
+
+    Keyword arguments:
+    size -- the maximum number of stats to hold
+
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        """ Return the Stats stored for key, or None """
+        stats = self.entries.pop(key, None)
+
+        if stats is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+            # Move to the most recently used end
+            self.entries[key] = stats
+
+        return stats
+
+    def store(self, key, stats):
+        self.entries[key] = stats
+
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def __str__(self):
+        return "Move cache: {0.hits} hits, {0.misses} misses, "\
+            "{0.evictions} evictions".format(self)
+
+
+class StepCounter(object):
+
+    """Count the Steps of a search which haven't been freed, and the most
+    held at once since the last reset.
+
+    Each Step is watched through a weak reference, whose callback counts it
+    out as it is freed.
+    """
+
+    def __init__(self):
+        self.refs = set()
+        self.peak = 0
+
+    @property
+    def alive(self):
+        """ The number of Steps which haven't been freed """
+        return len(self.refs)
+
+    def add(self, step):
+        self.refs.add(weakref.ref(step, self.refs.discard))
+        self.peak = max(self.peak, len(self.refs))
+
+    def reset(self):
+        """ Count the peak again from the Steps alive now """
+        self.peak = len(self.refs)
+
+
 class Stats(object):
 
     def __str__(self):
@@ -107,6 +312,36 @@ class Stats(object):
         return str(self)
 
 
+class MoveRecord(object):
+
+    """Hold a move which has been made, without the game it was made in.
+
+    Solving keeps one for every piece, so only what is needed to write the
+    output and show the move's statistics is kept.
+
+    Keyword arguments:
+    move -- the Move made
+
+    """
+
+    __slots__ = ('id', 'num', 'rotation', 'left', 'cost', 'stats')
+
+    def __init__(self, move):
+        self.id = move.piece.id
+        self.num = move.piece.num
+        self.rotation = move.piece.rotation
+        self.left = move.left
+        self.cost = move.cost
+        self.stats = move.stats
+
+    def __str__(self):
+        return "<Move: <Piece {0.id} shape:{0.num}> rot:{0.rotation}"\
+            " left:{0.left} cost:{0.cost:.2f}>".format(self)
+
+    def __repr__(self):
+        return str(self)
+
+
 class Move(object):
 
     """Hold a possible move to be made.
@@ -123,7 +358,7 @@ class Move(object):
         self.game = game
 
         # Store piece
-        self.piece = deepcopy(piece)
+        self.piece = piece.copy()
 
         # Store where to drop piece
         self.left = left
@@ -133,6 +368,9 @@ class Move(object):
 
         self.stats = Stats()
 
+        # Identifies the game after the move - see merge_duplicate_moves
+        self.state_key = None
+
     def __str__(self):
         if self.cost is not None:
             return "<Move: {0.piece} rot:{0.piece.rotation}"\
@@ -151,54 +389,442 @@ class Move(object):
         position of the centroid of the dropped piece its area above the
         previous maximum game height."""
 
-        previous_height = self.game.height
-        previous_num_gaps = self.game.num_gaps
+        self.stats = get_move_stats(self.game, self.piece, self.left)
+
+    def calculate_cost(self, weights):
+        """ Return cost of move given move stats and weightings """
+        values = [getattr(self.stats, name) for name in batch.features]
+
+        cost = sum(w * v for w, v in zip(weights.vector(), values))
+        cost += weights.starting_score
+
+        self.cost = cost
+
+
+def get_move_stats(game, piece, left):
+    """ Return the Stats of dropping piece into game at left. See
+    Move.try_dropping.
+
+    On a bitboard every stat is found in one pass over the board. Otherwise,
+    or when the piece is removed completely (see removed_piece_stats), a copy
+    of piece is dropped into a copy of game.
+    """
+
+    previous_height = game.height
+    previous_num_gaps = game.num_gaps
+
+    if game.board is not None:
+        # Every stat from one pass over the board, without copying the game
+        found = game.board.drop_stats(piece.rows, left, piece.bottom_profile)
+
+        if found is not None:
+            return drop_stats_to_stats(found, previous_height,
+                                       previous_num_gaps)
+
+    # Make temporary copy of the game
+    temp_game = game.copy()
+
+    # Try dropping (copy of) piece
+    temp_game.drop(piece.copy(), left)
+
+    rows_removed = temp_game.check_full_rows()
+    centroid, area = temp_game.calculate_blocks_above_height(
+        previous_height)
+    num_gaps = temp_game.count_gaps()
+    height = temp_game.height
+
+    # Store stats
+    stats = Stats()
+    stats.rows_removed = rows_removed
+    stats.centroid = centroid
+    stats.area = area
+    stats.gaps = num_gaps - previous_num_gaps
+    stats.height = height - previous_height
+
+    # Centroid y-position of previously placed piece
+    if temp_game.pieces:
+        stats.centroidy = temp_game.pieces[-1].polygon.centroid.y
+    else:
+        # Piece has been removed
+        stats.centroidy = 0
+
+    return stats
+
+
+def drop_stats_to_stats(found, previous_height, previous_num_gaps):
+    """ Return the Stats of a drop, from the tuple given by
+    BitBoard.drop_stats for a game of previous_height and gaps """
+
+    rows_removed, centroid, area, num_gaps, height, centroidy = found
+
+    stats = Stats()
+    stats.rows_removed = rows_removed
+    stats.centroid = centroid
+    stats.area = area
+    stats.gaps = num_gaps - previous_num_gaps
+    stats.height = height - previous_height
+    stats.centroidy = centroidy
+
+    return stats
+
+
+def removed_piece_stats(move):
+    """ Return the Stats of a move whose piece is removed completely by the
+    rows it fills.
+
+    The centroidy of such a move is that of the piece placed before it,
+    which the board alone doesn't give, so BitBoard.drop_stats returns None
+    and batch.placement_stats NaN for it. Instead the piece is dropped into
+    a copy of the game.
+    """
+    return get_move_stats(move.game, move.piece, move.left)
+
 
-        # Make temporary copy of the game
-        temp_game = deepcopy(self.game)
+def evaluate_placements(args):
+    """ Return the stats of dropping pieces onto boards. Runs in worker
+    processes, so takes one picklable argument of (boards, placements).
 
-        # Try dropping (copy of) piece
-        temp_game.drop(deepcopy(self.piece), self.left)
+    Placements onto a BitBoard are (board index, piece number, rotation,
+    left), and give the tuple of BitBoard.drop_stats, or None - see
+    removed_piece_stats. Boards of games held as polygons are snapshots
+    of the game, with placements of (board index, piece, left), and give
+    Stats.
+    """
+
+    boards, placements = args
+    rotations = get_shape_catalog().rotations
 
-        rows_removed = temp_game.check_full_rows()
-        centroid, area = temp_game.calculate_blocks_above_height(
-            previous_height)
-        num_gaps = temp_game.count_gaps()
-        height = temp_game.height
+    results = []
 
-        # Store stats
-        self.stats.rows_removed = rows_removed
-        self.stats.centroid = centroid
-        self.stats.area = area
-        self.stats.gaps = num_gaps - previous_num_gaps
-        self.stats.height = height - previous_height
+    for placement in placements:
+        board = boards[placement[0]]
 
-        # Centroid y-position of previously placed piece
-        if temp_game.pieces:
-            self.stats.centroidy = temp_game.pieces[-1].polygon.centroid.y
+        if isinstance(board, BitBoard):
+            num, rotation, left = placement[1:]
+            shape = rotations[num][rotation]
+            results.append(
+                board.drop_stats(shape.rows, left, shape.bottom_profile))
         else:
-            # Piece has been removed
-            self.stats.centroidy = 0
+            piece, left = placement[1:]
+            results.append(get_move_stats(board, piece, left))
 
-    def calculate_cost(self, weights):
-        """ Return cost of move given move stats and weightings """
-        cost = 0
+    return results
 
-        cost += weights.area * self.stats.area
-        cost += weights.centroid * self.stats.centroid
-        cost += weights.rows_removed * self.stats.rows_removed
-        cost += weights.gaps * self.stats.gaps
-        cost += weights.height * self.stats.height
-        cost += weights.centroidy * self.stats.centroidy
 
-        cost += weights.starting_score
+class ThreadEvaluator(object):
 
-        self.cost = cost
+    """Calculate the costs of moves using a pool of worker threads.
+
+    Keyword arguments:
+    weights -- the Weightings used to cost each move
+    num_workers -- number of threads to spawn
+
+    """
+
+    worker_names = ('thread', 'threads')
+
+    batch_children = False
+
+    def __init__(self, weights, num_workers):
+        self.weights = weights
+        self.q = Queue()  # Queue to hold possible moves
+
+        for i in range(num_workers):
+            t = Thread(target=self.worker)
+            t.daemon = True
+            t.start()
+
+    def worker(self):
+        """ Thread for calculating costs of moves """
+        while True:
+            pm = self.q.get()
+            pm.try_dropping()
+            pm.calculate_cost(self.weights)
+            self.q.task_done()
+
+    def evaluate(self, moves):
+        """ Calculate the stats and cost of each move """
+
+        # Put moves onto queue to be calculated
+        for pm in moves:
+            self.q.put(pm)
+
+        # Wait for threads to finish
+        self.q.join()
+
+    def close(self):
+        pass
+
+
+class ProcessEvaluator(object):
+
+    """Calculate the costs of moves using a pool of worker processes, so
+    evaluation isn't limited by the GIL.
+
+    The moves of each call are split evenly between the workers, in one
+    map over the pool. Each worker is sent the bitboards the moves are
+    played on, and each move as the number, rotation and position of its
+    piece, and sends back the stats of each.
+
+    Keyword arguments:
+    weights -- the Weightings used to cost each move
+    num_workers -- number of processes to spawn
+
+    """
+
+    worker_names = ('process', 'processes')
+
+    # Each call waits on the pool, so is worth making with more moves
+    batch_children = True
+
+    def __init__(self, weights, num_workers):
+        self.weights = weights
+        self.num_workers = num_workers
+        self.pool = multiprocessing.Pool(num_workers)
+
+    def evaluate(self, moves):
+        """ Calculate the stats and cost of each move """
+
+        if not moves:
+            return
+
+        size = -(-len(moves) // self.num_workers)
+        tasks = [placement_task(moves[start:start + size])
+                 for start in range(0, len(moves), size)]
+
+        results = self.pool.map(evaluate_placements, tasks)
+
+        for pm, found in zip(moves, chain.from_iterable(results)):
+            if isinstance(found, Stats):
+                pm.stats = found
+            elif found is None:
+                pm.stats = removed_piece_stats(pm)
+            else:
+                pm.stats = drop_stats_to_stats(found, pm.game.height,
+                                               pm.game.num_gaps)
+
+            pm.calculate_cost(self.weights)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+class BatchEvaluator(object):
+
+    """Calculate the costs of moves in one vectorised pass per game, using
+    NumPy. The board is stacked once for every placement, and the cost of
+    each is the dot product of its stats with the weightings.
+
+    Games held as polygons, and placements whose piece is removed
+    completely, are evaluated one move at a time.
+
+    Keyword arguments:
+    weights -- the Weightings used to cost each move
+    num_workers -- unused, moves are evaluated in the calling thread
+
+    """
+
+    worker_names = None
+
+    batch_children = False
+
+    def __init__(self, weights, num_workers):
+        self.weights = weights
+
+    def evaluate(self, moves):
+        """ Calculate the stats and cost of each move """
+
+        # Group moves by the game they are played in
+        games = {}
+        for pm in moves:
+            games.setdefault(id(pm.game), []).append(pm)
+
+        for game_moves in games.values():
+            game = game_moves[0].game
+
+            if game.board is None or game.width > batch.max_width:
+                for pm in game_moves:
+                    pm.try_dropping()
+                    pm.calculate_cost(self.weights)
+                continue
+
+            self.evaluate_batch(game, game_moves)
+
+    def evaluate_batch(self, game, moves):
+        """ Calculate the stats and cost of moves in a game on a bitboard """
+
+        cells = batch.board_array(game.board)
+        pieces = batch.pieces_array([pm.piece.rows for pm in moves])
+        lefts = [pm.left for pm in moves]
+
+        stats = batch.placement_stats(cells, pieces, lefts,
+                                      game.height, game.num_gaps)
+
+        costs = stats.dot(self.weights.vector()) + self.weights.starting_score
+
+        for pm, values, cost in zip(moves, stats.tolist(), costs.tolist()):
+            if isnan(cost):
+                pm.stats = removed_piece_stats(pm)
+                pm.calculate_cost(self.weights)
+                continue
+
+            pm.stats = Stats()
+            for name, value in zip(batch.features, values):
+                setattr(pm.stats, name, value)
+
+            pm.cost = cost
+
+    def close(self):
+        pass
+
+
+def placement_task(moves):
+    """ Return the argument of evaluate_placements for moves: each board
+    the moves are played on, once, and each move's placement """
+
+    boards = []
+    placements = []
+    indices = {}
+
+    for pm in moves:
+        game = pm.game
+
+        index = indices.get(id(game))
+        if index is None:
+            index = indices[id(game)] = len(boards)
+
+            if game.board is not None:
+                boards.append(game.board)
+            else:
+                boards.append(game.snapshot())
+
+        if game.board is not None:
+            placements.append((index, pm.piece.num, pm.piece.rotation,
+                               pm.left))
+        else:
+            placements.append((index, pm.piece, pm.left))
+
+    return boards, placements
+
+
+evaluators = {
+    'threads': ThreadEvaluator,
+    'processes': ProcessEvaluator,
+    'numpy': BatchEvaluator,
+}
+""" Move evaluation backends, by name """
+
+
+def get_possible_moves(game, piece):
+    """ Return all possible moves of piece in the game """
+
+    possible_moves = []
+
+    rotations = useful_rotations[piece.num]
+
+    # Queued pieces are shared between copies of the game
+    p = piece.copy()
+
+    # For each rotation
+    for rotation_id in rotations:
+        p.rotate(rotation_id)
+
+        # For each left position
+        for left in range(game.width - p.width + 1):
+            m = Move(game, p, rotation_id, left)
+            possible_moves.append(m)
+
+    return possible_moves
+
+
+def merge_duplicate_moves(moves, weights):
+    """ Return moves, without those giving the same game as an earlier
+    move. The game after each move is identified by its state_key.
+
+    Moves in one game with the same state_key have the same stats, so
+    only the first needs evaluating and searching.
+    """
+
+    if not weights.merge_duplicates:
+        return moves
+
+    for move in moves:
+        if move.game.board is not None:
+            move.state_key = move.game.board.placement_key(
+                move.piece.rows, move.left, move.piece.bottom_profile)
+
+    unique_moves = []
+    seen = set()
+
+    for move in moves:
+        if move.state_key is not None:
+            if move.state_key in seen:
+                continue
+            seen.add(move.state_key)
+
+        unique_moves.append(move)
+
+    weights.merged_moves += len(moves) - len(unique_moves)
+
+    return unique_moves
+
+
+def evaluate_moves(moves, weights):
+    """ Calculate the cost of each move, reusing the stats of placements
+    already tried on the same board """
+
+    cache = weights.move_cache
+
+    if cache is None:
+        weights.evaluator.evaluate(moves)
+        return
+
+    boards = {}
+    new_moves = []
+    new_keys = []
+
+    for move in moves:
+        board = boards.get(id(move.game))
+        if board is None:
+            board = boards[id(move.game)] = move_cache_board(move.game)
+
+        key = (board, move.piece.num, move.piece.rotation, move.left)
+        stats = cache.lookup(key)
+
+        if stats is None:
+            new_moves.append(move)
+            new_keys.append(key)
+        else:
+            move.stats = stats
+            move.calculate_cost(weights)
+
+    weights.evaluator.evaluate(new_moves)
+
+    for key, move in zip(new_keys, new_moves):
+        cache.store(key, move.stats)
+
+
+def move_cache_board(game):
+    """ Return the part of a MoveCache key identifying the game """
+
+    # removed_piece_stats uses the centroid of the last placed piece, so it
+    # is part of the board's identity
+    if game.pieces:
+        last_centroid = game.pieces[-1].polygon.centroid.y
+    else:
+        last_centroid = None
+
+    return (game.board_key(), last_centroid)
 
 
 class Step(object):
 
-    def __init__(self, game, depth=0, cost=0, move=None, weights=None):
+    def __init__(self, game, depth=0, cost=0, move=None, weights=None,
+                 search=True):
+
+        if weights is not None and weights.step_counter is not None:
+            weights.step_counter.add(self)
 
         self.game = game
         self.children = []
@@ -207,6 +833,38 @@ class Step(object):
         self.move = move
         self.best_child = None
 
+        # Moves not searched as they cost more than the best end node
+        self.skipped_moves = []
+
+        # Moves of the next piece, when evaluated along with the moves of
+        # this Step's siblings - see evaluate_children
+        self.evaluated_moves = None
+
+        # Children are searched by the StepSearch which made them
+        if search:
+            self.expand(weights)
+
+    def expand(self, weights):
+        """ Search the moves of the next piece in the game's input_queue,
+        and the whole tree below them """
+        StepSearch(self, weights).run()
+
+    def extend(self, pieces, weights):
+        """ Add pieces to the far end of the input_queue of every end node
+        below this Step, and search them.
+
+        Used to reuse the tree of the previous window, so only the newly
+        visible pieces need searching.
+        """
+        StepSearch(self, weights, self.iter_extend(pieces, weights)).run()
+
+    def iter_expand(self, weights):
+        """ Search the moves of the next piece in the game's input_queue.
+
+        A generator, run by StepSearch, which yields the search of each
+        child Step in turn, and carries on once it has been run.
+        """
+
         # No more moves to make - this is end node
         if not self.game.input_queue:
             self.piece = None
@@ -218,53 +876,180 @@ class Step(object):
 #                plot_game(self.game, '{0.game.status}_depth_{0.depth}_cost_{1:.2f}'.format(self, cost))
 
             # Set new best endstep cost if needed
-            weights.best_endstep_cost = min(weights.best_endstep_cost, cost)
+            weights.best_endstep_cost = min(weights.best_endstep_cost,
+                                            self.cumulative_cost)
 
             return
 
+        key = self.transposition_key(weights)
+
         # Get next piece
         self.piece = self.game.input_queue.pop()
 
+        # Reuse what was found when this state was last explored
+        if key is not None:
+            entry = weights.transpositions.lookup(key)
+
+            if entry is not None:
+                self.best_child, relative_cost = entry
+                self.best_cost = self.cumulative_cost + relative_cost
+
+                weights.best_endstep_cost = min(weights.best_endstep_cost,
+                                                self.best_cost)
+                return
+
 ##        print 'Possible moves for piece {}:'.format(piece.id)
 
-        # Determine possible moves
-        possible_moves = self.get_possible_moves()
+        if self.evaluated_moves is not None:
+            possible_moves = self.evaluated_moves
+            self.evaluated_moves = None
 
-        # Put moves onto queue to be calculated
-        for pm in possible_moves:
-            weights.q.put(pm)
+        else:
+            # Determine possible moves
+            possible_moves = self.get_possible_moves()
+            possible_moves = merge_duplicate_moves(possible_moves, weights)
 
-        # Wait for threads to finish
-        weights.q.join()
+            # Calculate the cost of each move
+            evaluate_moves(possible_moves, weights)
 
         # Sort possible moves by cost (best first)
         best_by_cost = sorted(possible_moves, key=attrgetter('cost'))
 
-        # Prune moves, based on their cost
-        best_by_cost = self.prune_moves(best_by_cost, weights)
+        if not weights.branch_and_bound:
+            # Prune moves, based on their cost
+            best_by_cost = self.prune_moves(best_by_cost, weights)
+
+            # Moves to make (up to a maximum number)
+            best_by_cost = best_by_cost[:weights.max_num_branches]
+
+        # With branch and bound, every move may be made, unless its lower
+        # bound is too high
+        for search in self.iter_make_moves(best_by_cost, weights):
+            yield search
+
+        self.choose_best_child(weights)
+
+        if self.children and key is not None:
+            weights.transpositions.store(
+                key, self.best_child, self.best_cost - self.cumulative_cost)
+
+    def iter_make_moves(self, moves, weights):
+        """ Yield the search of a child Step for each move """
 
-        # Moves to make (up to a maximum number)
-        for move in best_by_cost[:weights.max_num_branches]:
+        if weights.branch_and_bound:
+            queue_terms = queue_bound_terms(self.game.input_queue)
+            filled = self.game.calculate_blocks_above_height(0)[1]
 
-            if move.cost + self.cumulative_cost >= weights.best_endstep_cost:
+        # Some evaluators take about as long for a few moves as for many,
+        # so the moves of every child not yet beaten by the best end node
+        # are evaluated together. A child may still be skipped once its
+        # siblings have been searched
+        batch_children = weights.evaluator.batch_children and \
+            not weights.branch_and_bound and not weights.prune_subtrees
+
+        if batch_children:
+            children = {}
+            for index, move in enumerate(moves):
+                if move.cost + self.cumulative_cost < weights.best_endstep_cost:
+                    children[index] = self.make_child(move, weights)
+
+            evaluate_children(children.values(), weights)
+
+        for index, move in enumerate(moves):
+
+            # Lowest cost of an end node below the move
+            bound = move.cost + self.cumulative_cost
+
+            if weights.branch_and_bound:
+                rest = rest_cost_bound(self.game, move, filled, queue_terms,
+                                       weights)
+                bound = bound + rest if rest is not None else -weights.bignum
+
+            if bound >= weights.best_endstep_cost:
 ##                print 'Skipping due to best_endstep_cost', move.cost + self.cumulative_cost
 ##                print 'Skip depth: ', self.depth
-                continue
 
-            new_game = deepcopy(self.game)
-            new_game.drop(move.piece, move.left)
-            new_game.check_full_rows()
-            new_game.num_gaps = new_game.count_gaps()
+                # Only retried when the tree is extended
+                if not weights.prune_subtrees:
+                    self.skipped_moves.append(move)
+                continue
 
             # Iterate down
-            child = Step(new_game,
-                         self.depth + 1,
-                         self.cumulative_cost + move.cost,
-                         move, weights=weights)
+            if batch_children:
+                child = children[index]
+            else:
+                child = self.make_child(move, weights)
+
+            yield child.iter_expand(weights)
+
+            if weights.prune_subtrees:
+                # Keep the first of the cheapest, as choose_best_child does,
+                # and free the other
+                if not self.children or \
+                        child.best_cost < self.children[0].best_cost:
+                    self.children = [child]
+                continue
 
             self.children.append(child)
 
-        # Reference to the best child
+    def make_child(self, move, weights):
+        """ Return the child Step reached by move, without searching it """
+        new_game = self.game.copy()
+        new_game.drop(move.piece, move.left)
+        new_game.check_full_rows()
+        new_game.num_gaps = new_game.count_gaps()
+
+        return Step(new_game,
+                    self.depth + 1,
+                    self.cumulative_cost + move.cost,
+                    move, weights=weights, search=False)
+
+    def transposition_key(self, weights):
+        """ Return the key identifying this Step's state in the
+        TranspositionTable, by the board, as a MoveCache does, and the
+        pieces left to place. None without a table """
+        if weights.transpositions is None:
+            return None
+
+        return (move_cache_board(self.game), self.depth,
+                tuple(p.num for p in self.game.input_queue))
+
+    def iter_extend(self, pieces, weights):
+        """ Add pieces to the end nodes below this Step, as extend does.
+        A generator, run by StepSearch, like iter_expand """
+
+        if not self.children:
+            # End nodes, and Steps reusing the result of another Step,
+            # search again from here
+            queue = list(pieces) + self.game.input_queue
+            if self.piece is not None:
+                queue.append(self.piece)
+
+            self.game.input_queue = queue
+            self.best_child = None
+            self.skipped_moves = []
+
+            yield self.iter_expand(weights)
+            return
+
+        self.game.input_queue = list(pieces) + self.game.input_queue
+
+        for child in self.children:
+            yield child.iter_extend(pieces, weights)
+
+        # Moves skipped against the previous window's end nodes may be
+        # worth searching now
+        skipped_moves = self.skipped_moves
+        self.skipped_moves = []
+
+        for search in self.iter_make_moves(skipped_moves, weights):
+            yield search
+
+        self.choose_best_child(weights)
+
+    def choose_best_child(self, weights):
+        """ Reference the child with the best cost """
+
         if self.children:
             self.best_child = min(self.children, key=attrgetter('best_cost'))
             self.best_cost = self.best_child.best_cost
@@ -284,22 +1069,7 @@ class Step(object):
 
     def get_possible_moves(self):
         """ Return all possible moves given the game state and piece. """
-
-        possible_moves = []
-
-        rotations = useful_rotations[self.piece.num]
-
-        # For each rotation
-        for rotation_id in rotations:
-            p = self.piece
-            p.rotate(rotation_id)
-
-            # For each left position
-            for left in range(self.game.width - self.piece.width + 1):
-                m = Move(self.game, p, rotation_id, left)
-                possible_moves.append(m)
-
-        return possible_moves
+        return get_possible_moves(self.game, self.piece)
 
     def prune_moves(self, moves, weights):
 
@@ -330,74 +1100,232 @@ class Step(object):
         return [move for move in moves if not weights.skip_move(self.depth, move.cost)]
 
 
-def get_best_moves(game, num_worker_threads=None):
-    """ Main smarts """
+class StepSearch(object):
+
+    """Search the tree below a Step, depth first, without recursing.
+
+    Each Step being searched is a generator, which yields the search of each
+    of its children in turn. The generators are held on an explicit stack,
+    so the depth of the tree isn't limited by Python's recursion limit, and
+    a search stopped at a time limit can be run again to carry on.
+
+    Keyword arguments:
+    step -- the root Step of the search
+    weights -- the Weightings to search with
+    search -- the generator to start with, defaults to the search of the
+              moves of step's next piece
+
+    """
+
+    def __init__(self, step, weights, search=None):
+        self.step = step
+        self.weights = weights
+
+        if search is None:
+            search = step.iter_expand(weights)
+
+        self.stack = [search]
+
+    @property
+    def finished(self):
+        """ Whether the whole tree has been searched """
+        return not self.stack
+
+    def run(self, stop_time=None):
+        """ Search until the tree is finished or stop_time has passed, and
+        return whether it's finished """
+        stack = self.stack
+
+        while stack:
+            if stop_time is not None and time() > stop_time:
+                return False
+
+            try:
+                search = next(stack[-1])
+            except StopIteration:
+                # This Step is done - carry on with its parent
+                stack.pop()
+            else:
+                stack.append(search)
+
+        return True
+
+
+def get_best_moves(game, weights=None, pieces=None):
+    """ Main smarts. Returns a list of MoveRecords of the best moves - see
+    iter_best_moves for the arguments """
+    return list(iter_best_moves(game, weights, pieces))
+
+
+def iter_best_moves(game, weights=None, pieces=None):
+    """ Yields a MoveRecord of each of the best moves in order, as soon as
+    the solver has committed to it
+
+    Keyword arguments:
+    game -- the game to play, with pieces in its input_queue
+    weights -- the Weightings to cost moves with, which also hold the
+               settings of the solver. Defaults to Weightings()
+    pieces -- iterable of pieces to play in order, instead of the game's
+              input_queue. Only read as far as the lookahead needs
+
+    """
 
     from shapely import speedups
     if speedups.available:
 ##        print 'Using C compiler for performance enhancements!'
         speedups.enable()
 
-    # Pre-calculate which rotations are useful for each piece number (1-7)
+    # Which rotations are useful for each piece number (1-7), worked out
+    # once per table of shapes
     global useful_rotations  # Global to have shared amongst all Steps
-    useful_rotations = {i: num_useful_rotations(i)
-                        for i in Pieces.piece_shapes.keys()}
+    useful_rotations = get_shape_catalog().useful_rotations
 
-    weights = Weightings()
+    # The search keeps its state on the weightings, so uses a copy
+    weights = copy(weights) if weights is not None else Weightings()
 
 ##    print 'Using a lookahead of {} with a step of {}'.format(
 ##        weights.lookahead_distance, weights.step_distance)
 
-    # Copy the game's queue
-    piece_queue = deepcopy(game.input_queue)
+    if pieces is None:
+        # Pieces are taken from the end of the game's queue
+        pieces = game.input_queue[::-1]
 
-    # List to remember the moves we make
-    moves = []
-    moves_made = 0
+    # Pieces from an iterator are counted as they are read
+    num_pieces = len(pieces) if hasattr(pieces, '__len__') else None
+
+    # The moves made are yielded, so the searches needn't remember them
+    game = game.copy()
+    game.record_placements = False
+    game.placements = None
 
     # Split processing across multiple CPUs
-    if num_worker_threads is None:
-        num_worker_threads = multiprocessing.cpu_count()
+    num_workers = weights.num_workers
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
 
-    print 'Spawning {} thread{}'.format(num_worker_threads,
-                                        's' if num_worker_threads > 1 else '')
+    evaluator = evaluators[weights.backend]
+    if evaluator.worker_names:
+        print 'Spawning {} {}'.format(
+            num_workers, evaluator.worker_names[num_workers > 1])
 
-    weights.q = Queue()  # Queue to hold possible moves
+    weights.evaluator = evaluator(weights, num_workers)
 
-    # Thread for calculating costs of moves
-    def worker():
-        while True:
-            pm = weights.q.get()
-            pm.try_dropping()
-            pm.calculate_cost(weights)
-            weights.q.task_done()
+    # Results found with a bound from one path may be cut short on another,
+    # and the table's best children would keep pruned subtrees alive
+    if weights.use_transposition_table and weights.solver == 'tree' \
+            and not weights.branch_and_bound and not weights.prune_subtrees:
+        weights.transpositions = TranspositionTable()
+
+    if weights.move_cache_size > 0:
+        weights.move_cache = MoveCache(weights.move_cache_size)
 
-    for i in range(num_worker_threads):
-        t = Thread(target=worker)
-        t.daemon = True
-        t.start()
+    if weights.step_counter is None and (weights.print_stats or
+                                         weights.prune_subtrees):
+        weights.step_counter = StepCounter()
 
-    while moves_made < len(piece_queue):
+    if weights.merge_duplicates is None:
+        weights.merge_duplicates = weights.solver == 'beam'
 
-        # Set input queue to just first lookahead_distance pieces (from end)
-        start_index = - weights.lookahead_distance - moves_made
-        end_index = - moves_made if moves_made > 0 else None
-        game.input_queue = deepcopy(piece_queue[start_index:end_index])
+    if weights.solver == 'beam' and (weights.time_per_move is not None or
+                                     weights.deadline is not None):
+        raise ValueError("Time limits only apply to the tree solver")
+
+    if weights.deadline is not None:
+        if num_pieces is None:
+            raise ValueError("A deadline needs the number of pieces to play")
+
+        weights.deadline_time = time() + weights.deadline
+
+    solver = solvers[weights.solver]
+
+    try:
+        for move in solver(game, iter(pieces), num_pieces, weights):
+            yield MoveRecord(move)
+    finally:
+        weights.evaluator.close()
+
+    if weights.transpositions is not None:
+        print weights.transpositions
+
+    if weights.move_cache is not None:
+        print weights.move_cache
+
+    if weights.merge_duplicates:
+        print 'Merged {} duplicate moves'.format(weights.merged_moves)
+
+    # Over the life of the process, not just this solve
+    peak = peak_memory()
+    if peak is not None:
+        print 'Process peak RSS {:.1f}MB'.format(peak)
+
+
+def search(game, pieces, num_pieces, weights):
+    """ Yield the best moves to play each of pieces, as each window is
+    searched. Only lookahead_distance pieces are read ahead of the moves made,
+    so pieces may be a stream whose length (num_pieces) isn't known """
+
+    moves_made = 0
+
+    # The next lookahead_distance pieces - the next piece is at the end
+    window = []
+
+    # Step of the previous window to search from
+    reused_step = None
+
+    # Deepening searches build a new tree for each lookahead, and pruned
+    # trees only hold the best moves
+    reuse_tree = weights.reuse_tree and weights.time_per_move is None \
+        and weights.deadline is None and not weights.prune_subtrees
+
+    while True:
+
+        # Top up the window with the pieces which have arrived
+        num_new = 0
+        while len(window) < weights.lookahead_distance:
+            piece = next(pieces, None)
+            if piece is None:
+                break
+
+            window.insert(0, piece)
+            num_new += 1
+
+        if not window:
+            break
 
 ##        print "Input queue:", game.input_queue
-##        print 'Numbers:', moves_made, len(game.input_queue), len(piece_queue)
+##        print 'Numbers:', moves_made, len(game.input_queue), num_pieces
 
         # Can finish game now
-        if moves_made + len(game.input_queue) == len(piece_queue):
-            weights.step_distance = len(game.input_queue)
+        if len(window) < weights.lookahead_distance \
+                or moves_made + len(window) == num_pieces:
+            weights.step_distance = len(window)
 ##            print 'Finish him!', weights.step_distance
 
-        weights.best_endstep_cost = weights.bignum
-        weights.best_cost_at_depth = {}
-        weights.worst_cost_at_depth = {}
+        # Count the Steps held while searching this window
+        if weights.step_counter is not None:
+            weights.step_counter.reset()
+
+        if reused_step is not None:
+            # Only the pieces at the far end of the window are new
+            start_search(weights)
 
-        # Step through pieces
-        step = Step(game, depth=moves_made, weights=weights)
+            step = reused_step
+            step.extend(window[:num_new], weights)
+
+        else:
+            # Step through pieces
+            game.input_queue = list(window)
+
+            if num_pieces is not None:
+                pieces_left = num_pieces - moves_made
+            else:
+                pieces_left = None
+
+            step = search_window(game, moves_made, pieces_left, weights)
+
+        if weights.print_stats or weights.prune_subtrees:
+            print 'Window searched holding at most {} Steps'.format(
+                weights.step_counter.peak)
 
         # Make step_distance moves down tree in best direction
         for i in range(weights.step_distance):
@@ -409,17 +1337,332 @@ def get_best_moves(game, num_worker_threads=None):
 
             # Go to next step
             step = step.best_child
+            window.pop()
 
-            moves.append(step.move)
             moves_made += 1
 
-            print 'Move {} of {} complete'.format(moves_made, len(piece_queue))
+            if num_pieces is not None:
+                print 'Move {} of {} complete'.format(moves_made, num_pieces)
+            else:
+                print 'Move {} complete'.format(moves_made)
+
+            yield step.move
 
 ##            print 'Move:', step.move
 
         # Use game state
         game = step.game
 
-##    print 'Moves:'
-##    pprint(moves)
-    return moves
+        if reuse_tree:
+            reused_step = step
+
+
+def peak_memory():
+    """ Return the most memory used by the process so far in MB, or None
+    where it can't be found """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # Kilobytes on Linux, bytes on OS X
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024
+
+    return peak / 1024.0
+
+
+def evaluate_children(children, weights):
+    """ Evaluate the moves of the next piece of each of children together,
+    keeping each child's moves for when it is searched. Children which are
+    end nodes, or whose state is in the TranspositionTable, have no moves
+    to evaluate """
+
+    moves = []
+
+    for child in children:
+        queue = child.game.input_queue
+        if not queue:
+            continue
+
+        key = child.transposition_key(weights)
+        if key is not None and key in weights.transpositions:
+            continue
+
+        child_moves = get_possible_moves(child.game, queue[-1])
+        child.evaluated_moves = merge_duplicate_moves(child_moves, weights)
+        moves.extend(child.evaluated_moves)
+
+    evaluate_moves(moves, weights)
+
+
+def queue_bound_terms(queue):
+    """ Return the number of pieces in a queue, the most rows they could
+    remove and their total area """
+
+    rotations = get_shape_catalog().rotations
+
+    num_rows = 0
+    area = 0
+
+    for piece in queue:
+        shapes = rotations[piece.num]
+        num_rows += max(int(ceil(s.bounds[3] - s.bounds[1])) for s in shapes)
+        area += shapes[0].area
+
+    return len(queue), num_rows, area
+
+
+def rest_cost_bound(game, move, filled, queue_terms, weights):
+    """ Return a lower bound on the cost of placing the queued pieces after
+    making move in game, or None if the weightings don't allow one.
+
+    Move costs are the weighted sum of their stats and starting_score.
+    Area, centroid and centroidy are never negative. Over the whole queue,
+    the changes in gaps add up to no less than minus the gaps after the
+    move, and the changes in height to no less than minus the smaller of
+    the height and the rows removed. So only the rows removed are bounded,
+    by the piece heights and by the squares there are to fill rows with.
+
+    Keyword arguments:
+    game -- the game before the move
+    move -- a Move with stats
+    filled -- the area of squares filled in game
+    queue_terms -- the pieces queued after the move, from queue_bound_terms
+    weights -- the Weightings
+
+    """
+
+    num_pieces, num_rows, area = queue_terms
+
+    if not num_pieces:
+        return 0
+
+    if min(weights.area, weights.centroid, weights.centroidy,
+           weights.gaps, weights.height) < 0:
+        return None
+
+    stats = move.stats
+    height = game.height + stats.height
+    gaps = game.num_gaps + stats.gaps
+    filled += move.piece.polygon.area - game.width * stats.rows_removed
+
+    max_rows = min(num_rows, int((filled + area) / game.width))
+
+    # The cost of removing rows is piecewise linear, so lowest at an end
+    # or where the height runs out
+    rows_cost = min(
+        weights.rows_removed * rows - weights.height * min(height, rows)
+        for rows in set([0, min(height, max_rows), max_rows]))
+
+    return num_pieces * weights.starting_score + rows_cost \
+        - weights.gaps * gaps
+
+
+def search_window(game, depth, pieces_left, weights):
+    """ Return the root Step of a search of the pieces in game.input_queue.
+
+    With a time limit, the lookahead is deepened one piece at a time, and
+    the Step of the deepest search finished in time is returned.
+    """
+
+    if weights.time_per_move is None and weights.deadline is None:
+        start_search(weights)
+        return Step(game, depth=depth, weights=weights)
+
+    # Share the time left between the pieces left
+    budgets = []
+    if weights.time_per_move is not None:
+        budgets.append(weights.time_per_move)
+    if weights.deadline is not None:
+        budgets.append((weights.deadline_time - time()) / pieces_left)
+
+    stop_time = time() + min(budgets)
+
+    window = game.input_queue
+    step = None
+
+    for lookahead in range(1, len(window) + 1):
+        # The next pieces are at the end of the queue
+        game.input_queue = window[-lookahead:]
+        start_search(weights)
+
+        deeper_step = Step(game, depth=depth, weights=weights, search=False)
+        deeper_search = StepSearch(deeper_step, weights)
+
+        # Always finish the first search, so there is a move to make
+        if step is None:
+            deeper_search.run()
+        elif not deeper_search.run(stop_time):
+            break
+
+        step = deeper_step
+
+    return step
+
+
+def start_search(weights):
+    """ Forget the costs found by the previous search """
+
+    weights.best_endstep_cost = weights.bignum
+    weights.best_cost_at_depth = {}
+    weights.worst_cost_at_depth = {}
+
+    # States are keyed by depth, so won't be seen in later windows
+    if weights.transpositions is not None:
+        weights.transpositions.clear()
+
+
+class BeamNode(object):
+
+    """Hold a game kept in the beam, and the move which reached it.
+
+    Keyword arguments:
+    game -- the game after the move
+    cost -- cumulative cost of the moves to reach the game
+    move -- the last move made
+    parent -- the BeamNode the move was made from
+
+    """
+
+    def __init__(self, game, cost=0, move=None, parent=None):
+        self.game = game
+        self.cost = cost
+        self.move = move
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+
+    def __str__(self):
+        return "<BeamNode: cost:{0.cost:.2f}>".format(self)
+
+    def __repr__(self):
+        return str(self)
+
+    def get_moves(self, since=None):
+        """ Return the moves made to reach this node, first to last.
+        Only the moves after the ancestor node since, if given """
+        moves = []
+        node = self
+
+        while node.move is not None and node is not since:
+            moves.append(node.move)
+            node = node.parent
+
+        moves.reverse()
+        return moves
+
+    def get_ancestor(self, depth):
+        """ Return the node at depth which this node was reached through """
+        node = self
+
+        while node.depth > depth:
+            node = node.parent
+
+        return node
+
+
+def beam_search(game, pieces, num_pieces, weights):
+    """ Yield the best moves to play each of pieces, found by
+    keeping only the beam_width cheapest games at each depth.
+
+    Every move from every game in the beam is evaluated in one batch, so
+    the amount of work per piece is fixed by the beam width. Moves are
+    yielded once every game in the beam has made them.
+
+    When pieces is a stream, a move is also made once the beam is
+    lookahead_distance pieces past the last move, as the tree solver does,
+    so moves don't wait on the beam agreeing for ever. The cheapest game's
+    next move is made, and the games not reached through it are dropped.
+    """
+
+    game.input_queue = []
+    beam = [BeamNode(game)]
+
+    # Last node every game in the beam has come through
+    committed = beam[0]
+
+    for depth, piece in enumerate(pieces):
+
+        possible_moves = []
+        parents = []
+
+        for node in beam:
+            node_moves = get_possible_moves(node.game, piece)
+            node_moves = merge_duplicate_moves(node_moves, weights)
+
+            for move in node_moves:
+                possible_moves.append(move)
+                parents.append(node)
+
+        # Calculate the cost of every move at this depth together
+        evaluate_moves(possible_moves, weights)
+
+        candidates = sorted(zip(possible_moves, parents),
+                            key=lambda candidate: candidate[1].cost + candidate[0].cost)
+
+        beam = []
+        seen = set()
+
+        for move, parent in candidates:
+            if len(beam) == weights.beam_width:
+                break
+
+            # Keep only the cheapest way to reach each game
+            if move.state_key is not None and weights.merge_duplicates:
+                if move.state_key in seen:
+                    weights.merged_moves += 1
+                    continue
+                seen.add(move.state_key)
+
+            new_game = parent.game.copy()
+            new_game.drop(move.piece, move.left)
+            new_game.check_full_rows()
+            new_game.num_gaps = new_game.count_gaps()
+
+            beam.append(BeamNode(new_game, parent.cost + move.cost,
+                                 move, parent))
+
+        if num_pieces is not None:
+            print 'Piece {} of {} searched'.format(depth + 1, num_pieces)
+        else:
+            print 'Piece {} searched'.format(depth + 1)
+
+        ancestor = common_ancestor(beam)
+
+        # The beam is sorted cheapest first
+        if num_pieces is None and \
+                beam[0].depth - ancestor.depth >= weights.lookahead_distance:
+            ancestor = beam[0].get_ancestor(ancestor.depth + 1)
+            beam = [node for node in beam
+                    if node.get_ancestor(ancestor.depth) is ancestor]
+
+        for move in ancestor.get_moves(committed):
+            yield move
+
+        # Forget the nodes before, so memory doesn't grow with the game
+        committed = ancestor
+        committed.parent = None
+
+    best = min(beam, key=attrgetter('cost'))
+
+    for move in best.get_moves(committed):
+        yield move
+
+
+def common_ancestor(nodes):
+    """ Return the latest BeamNode which every node (all of the same depth)
+    was reached through """
+    nodes = set(nodes)
+
+    while len(nodes) > 1:
+        nodes = set(node.parent for node in nodes)
+
+    return nodes.pop()
+
+
+solvers = {
+    'tree': search,
+    'beam': beam_search,
+}
+""" Search strategies, by name """
@@ -0,0 +1,143 @@
+#-------------------------------------------------------------------------
+# Name:        Batch Operations
+# Purpose:     Vectorised evaluation of every placement of a piece on a
+#              BitBoard at once, using NumPy
+#
+# Version:     Python 2.7
+#
+# Author:      Tetris-AI contributors
+#
+# Created:     18/10/2026
+# Copyright:   (c) Tetris-AI contributors 2026
+# Licence:     MIT
+#-------------------------------------------------------------------------
+
+import numpy as np
+
+"""
+Houses the batched move evaluation used by ai.py.
+
+Boards and pieces are held as boolean arrays indexed [row, column], with
+row 0 at the bottom. A batch of placements is evaluated by stacking a copy
+of the board for each placement, so each feature is one array operation.
+
+"""
+
+features = ('area', 'centroid', 'rows_removed', 'gaps', 'height', 'centroidy')
+""" Columns of the array returned by placement_stats, in order """
+
+max_width = 62
+""" Widest board whose rows fit in a 64 bit integer """
+
+
+def board_array(board):
+    """ Returns the squares of a BitBoard as a boolean array """
+    bits = 1 << np.arange(board.width, dtype=np.int64)
+    rows = np.array(board.rows, dtype=np.int64).reshape(-1, 1)
+
+    return (rows & bits) != 0
+
+
+def pieces_array(piece_rows):
+    """ Returns a boolean array [placement, row, column] of the squares of
+    each piece, given their row bitmasks. Smaller pieces are padded """
+    height = max(len(rows) for rows in piece_rows)
+    width = max(max(rows).bit_length() for rows in piece_rows)
+
+    padded = [list(rows) + [0] * (height - len(rows)) for rows in piece_rows]
+
+    bits = 1 << np.arange(width, dtype=np.int64)
+    masks = np.array(padded, dtype=np.int64).reshape(len(piece_rows), height, 1)
+
+    return (masks & bits) != 0
+
+
+def placement_stats(cells, pieces, lefts, previous_height, previous_gaps):
+    """ Returns an array [placement, feature] of the stats of dropping each
+    piece into the board at lefts, in the order of features.
+
+    The centroidy of a piece that is removed completely is returned as NaN.
+
+    Keyword arguments:
+    cells -- the board, from board_array
+    pieces -- the pieces to drop, from pieces_array
+    lefts -- where to drop each piece
+    previous_height -- the game height before dropping
+    previous_gaps -- the number of gaps before dropping
+
+    """
+    num_placements, piece_height, piece_width = pieces.shape
+    board_height, width = cells.shape
+
+    lefts = np.asarray(lefts, dtype=int)
+
+    # Columns each placement covers, clipped for the padding of narrow pieces
+    columns = lefts.reshape(-1, 1) + np.arange(piece_width)
+    columns = np.minimum(columns, width - 1)
+
+    # Skyline of the board, and bottom profile of each piece
+    skyline = (cells * np.arange(1, board_height + 1).reshape(-1, 1)).max(
+        axis=0) if board_height else np.zeros(width, dtype=int)
+
+    covered = pieces.any(axis=1)
+    lowest = pieces.argmax(axis=1)
+
+    # Land on whichever column first meets the bottom of the piece
+    landing = np.where(covered, skyline[columns] - lowest, 0)
+    bottoms = np.maximum(landing.max(axis=1), 0)
+
+    # Place each piece on its own copy of the board
+    total_height = board_height + piece_height
+    boards = np.zeros((num_placements, total_height, width), dtype=bool)
+    boards[:, :board_height] = cells
+
+    placement, row, column = np.nonzero(pieces)
+    row = bottoms[placement] + row
+    column = lefts[placement] + column
+
+    boards[placement, row, column] = True
+
+    placed = np.zeros_like(boards)
+    placed[placement, row, column] = True
+
+    # Remove full rows, moving the rows above them down
+    full = boards.all(axis=2)
+    kept = ~full
+    new_row = np.cumsum(kept, axis=1) - 1
+
+    filled = boards & kept[:, :, np.newaxis]
+    placed &= kept[:, :, np.newaxis]
+
+    centres = (new_row + 0.5)[:, :, np.newaxis]
+
+    # Heights of each column after removing rows
+    column_heights = np.where(
+        filled, (new_row + 1)[:, :, np.newaxis], 0).max(axis=1)
+    heights = column_heights.max(axis=1)
+
+    # Empty squares beneath the top of each column
+    gaps = column_heights.sum(axis=1) - filled.sum(axis=(1, 2))
+
+    # Blocks above the previous game height
+    above = filled & (new_row >= previous_height)[:, :, np.newaxis]
+    area = above.sum(axis=(1, 2))
+    moment = (above * centres).sum(axis=(1, 2))
+    centroid = np.where(area > 0, moment / np.maximum(area, 1)
+                        - previous_height, 0)
+
+    # Centroid of what is left of the dropped piece
+    placed_area = placed.sum(axis=(1, 2))
+    placed_moment = (placed * centres).sum(axis=(1, 2))
+    centroidy = np.where(placed_area > 0,
+                         placed_moment / np.maximum(placed_area, 1), np.nan)
+
+    stats = {
+        'area': area,
+        'centroid': centroid,
+        'rows_removed': full.sum(axis=1),
+        'gaps': gaps - previous_gaps,
+        'height': heights - previous_height,
+        'centroidy': centroidy,
+    }
+
+    return np.column_stack([stats[name] for name in features]).astype(float)
@@ -12,6 +12,7 @@
 #-------------------------------------------------------------------------
 
 import os
+import multiprocessing
 from time import clock, time
 from random import randint
 from copy import deepcopy
@@ -107,7 +108,35 @@ def benchmark_time_vs_height():
                 print i, branches, lookahead, delay, height
 
 
-def time_solve(pieces, name):
+def benchmark_workers():
+    """ Vary the number of worker threads and processes to see how move
+    evaluation scales across CPU cores """
+    num_pieces = 100
+
+    pieces = [TetrisPiece(randint(1, 7), piece_id)
+              for piece_id in range(0, num_pieces)]
+
+    num_cores = multiprocessing.cpu_count()
+    print '{} CPU cores'.format(num_cores)
+    print 'backend workers delay speedup height'
+
+    for backend in ['threads', 'processes']:
+        single_delay = None
+
+        # Past the number of cores, to show where scaling stops
+        for workers in range(1, max(num_cores, 4) + 1):
+            weights = Weightings(backend=backend, num_workers=workers)
+
+            name = 'benchmark/workers_{}_{}'.format(backend, workers)
+            delay, height, game = time_solve(deepcopy(pieces), name, weights)
+
+            if single_delay is None:
+                single_delay = delay
+
+            print backend, workers, delay, single_delay / delay, height
+
+
+def time_solve(pieces, name, weights=None):
     """ Return AI execution time """
 
     start_time = time()
@@ -115,7 +144,7 @@ def time_solve(pieces, name):
     # Initialise game with list of pieces
     game = TetrisGame(pieces, width=7)
     game.status = name
-    game.solve()
+    game.solve(weights)
 
     end_time = time()
     delay = end_time - start_time
@@ -0,0 +1,397 @@
+#-------------------------------------------------------------------------
+# Name:        Bitboard Operations
+# Purpose:     Integer bitmask representation of the game board, used
+#              instead of polygon operations when all pieces lie on the
+#              unit grid
+#
+# Version:     Python 2.7
+#
+# Author:      Tetris-AI contributors
+#
+# Created:     18/10/2026
+# Copyright:   (c) Tetris-AI contributors 2026
+# Licence:     MIT
+#-------------------------------------------------------------------------
+
+from copy import copy
+
+"""
+Houses the BitBoard used by tetris.py when every shape is rectilinear.
+
+Each row of the board is stored as an integer, with bit x set when the
+square x from the left is filled. Row 0 is the bottom row.
+
+"""
+
+
+class BitBoard(object):
+
+    """Hold the filled squares of a game board as one integer per row.
+
+    Keyword arguments:
+    width -- the game width
+
+    """
+
+    def __init__(self, width):
+        self.width = width
+
+        # Mask of a completely full row
+        self.full_row = (1 << width) - 1
+
+        # Row bitmasks, from the bottom up. The top row is never empty.
+        self.rows = []
+
+        # Height of the highest filled square in each column - see .skyline
+        self._skyline = [0] * width
+
+    @property
+    def height(self):
+        """Number of rows from the bottom to the highest filled square"""
+        return len(self.rows)
+
+    @property
+    def skyline(self):
+        """Number of rows from the bottom to the top filled square of
+        each column, from left to right"""
+        if self._skyline is None:
+            self._skyline = column_heights(self.rows, self.width)
+
+        return self._skyline
+
+    def copy(self):
+        """ Return a copy of the board which can be changed independently """
+        board = copy(self)
+        board.rows = list(self.rows)
+
+        if self._skyline is not None:
+            board._skyline = list(self._skyline)
+
+        return board
+
+    def drop_position(self, piece_rows, left, profile=None):
+        """ Returns the bottom row a piece comes to rest on when dropped
+        down from the top of the board.
+
+        The piece lands on whichever column of the skyline first meets the
+        bottom of the piece, given by its bottom profile.
+        """
+        left = int(left)
+
+        if profile is None:
+            profile = bottom_profile(piece_rows)
+
+        skyline = self.skyline
+        bottom = 0
+
+        for column, offset in enumerate(profile):
+            if offset is not None:
+                bottom = max(bottom, skyline[left + column] - offset)
+
+        return bottom
+
+    def place(self, piece_rows, left, bottom):
+        """ Fill the squares covered by piece rows at left, bottom """
+        left = int(left)
+        bottom = int(bottom)
+        rows = self.rows
+
+        top = bottom + len(piece_rows)
+        if top > len(rows):
+            rows.extend([0] * (top - len(rows)))
+
+        skyline = self._skyline
+
+        for index, mask in enumerate(piece_rows):
+            mask <<= left
+            rows[bottom + index] |= mask
+
+            # Raise the columns this row of the piece covers
+            if skyline is not None:
+                column = 0
+                while mask:
+                    if mask & 1:
+                        skyline[column] = max(skyline[column], bottom + index + 1)
+                    mask >>= 1
+                    column += 1
+
+        # Remove any empty rows left at the top
+        while rows and not rows[-1]:
+            rows.pop()
+
+    def placement_key(self, piece_rows, left, profile=None):
+        """ Returns a key identifying the board after dropping a piece and
+        removing full rows.
+
+        The key is the rows left, with the number of the piece's squares
+        left and the sum of twice their centre heights, so that equal keys
+        give the same board and the same centroid of the piece. None when
+        the piece is removed completely.
+        """
+        left = int(left)
+        bottom = self.drop_position(piece_rows, left, profile)
+
+        rows = list(self.rows)
+        top = bottom + len(piece_rows)
+        if top > len(rows):
+            rows.extend([0] * (top - len(rows)))
+
+        for index, mask in enumerate(piece_rows):
+            rows[bottom + index] |= mask << left
+
+        count = 0
+        moment = 0
+        removed = 0
+
+        # Only rows the piece covers can be full
+        for index, mask in enumerate(piece_rows):
+            row_id = bottom + index
+
+            if rows[row_id] == self.full_row:
+                removed += 1
+                continue
+
+            squares = bin(mask).count('1')
+            count += squares
+            moment += squares * (2 * (row_id - removed) + 1)
+
+        if not count:
+            return None
+
+        rows = [row for row in rows if row != self.full_row]
+
+        return tuple(rows), count, moment
+
+    def drop_stats(self, piece_rows, left, profile=None):
+        """ Returns the stats of dropping a piece and removing full rows,
+        without changing the board, as a tuple of (rows removed, centroid,
+        area, gaps, height, centroidy).
+
+        The board after the drop is scanned once, from the top down. centroid
+        and area are of the squares above the current height, as given by
+        blocks_above_height, and centroidy is the centre height of what is
+        left of the piece. None when the piece is removed completely.
+        """
+        left = int(left)
+        bottom = self.drop_position(piece_rows, left, profile)
+        previous_height = len(self.rows)
+        full_row = self.full_row
+
+        rows = list(self.rows)
+        top = bottom + len(piece_rows)
+        if top > len(rows):
+            rows.extend([0] * (top - len(rows)))
+
+        for index, mask in enumerate(piece_rows):
+            rows[bottom + index] |= mask << left
+
+        # Usually only rows the piece covers are full, but any others are
+        # removed too, as TetrisGame.check_full_rows does
+        removed = rows.count(full_row)
+
+        # Full rows beneath each row of the piece
+        below = rows[:bottom].count(full_row) if removed else 0
+
+        count = 0
+        moment = 0
+
+        for index, mask in enumerate(piece_rows):
+            row_id = bottom + index
+
+            if rows[row_id] == full_row:
+                below += 1
+                continue
+
+            squares = bin(mask).count('1')
+            count += squares
+            moment += squares * (2 * (row_id - below) + 1)
+
+        if not count:
+            return None
+
+        if removed:
+            rows = [row for row in rows if row != full_row]
+
+        while rows and not rows[-1]:
+            rows.pop()
+
+        gaps = 0
+        area = 0
+        moment_above = 0.0
+
+        # Columns with a filled square in a row further up
+        covered = 0
+
+        for row_id in xrange(len(rows) - 1, -1, -1):
+            row = rows[row_id]
+
+            gaps += bin(covered & ~row).count('1')
+            covered |= row
+
+            if row_id >= previous_height:
+                squares = bin(row).count('1')
+                area += squares
+                moment_above += squares * (row_id + 0.5)
+
+        if area == 0:
+            centroid = 0
+        else:
+            centroid = moment_above / area - previous_height
+
+        return removed, centroid, area, gaps, len(rows), moment / (2.0 * count)
+
+    def is_row_full(self, row_id):
+        """ Returns whether a row is completely full """
+        return row_id < len(self.rows) and self.rows[row_id] == self.full_row
+
+    def remove_row(self, row_id):
+        """ Remove a row, moving every row above it down by one """
+        del self.rows[row_id]
+
+        # Columns may drop by more than one row, so work the skyline out
+        # again when it is next needed
+        self._skyline = None
+
+    def count_gaps(self):
+        """ Count the empty squares beneath the highest filled square
+        of each column """
+        rows = self.rows
+        gap_count = 0
+
+        # Left to right
+        for left in xrange(self.width):
+            bit = 1 << left
+            found = False
+
+            # Top to bottom
+            for row in reversed(rows):
+                if row & bit:
+                    found = True
+                elif found:
+                    gap_count += 1
+
+        return gap_count
+
+    def blocks_above_height(self, height):
+        """ Returns a tuple of centroid, and area of squares above height.
+        Centroid is relative to height """
+        area = 0
+        moment = 0.0
+
+        for row_id in xrange(height, len(self.rows)):
+            count = bin(self.rows[row_id]).count('1')
+            area += count
+            moment += count * (row_id + 0.5)
+
+        if area == 0:
+            return 0, 0
+
+        return moment / area - height, area
+
+
+def column_heights(rows, width):
+    """ Returns the number of rows from the bottom to the top filled square
+    of each column """
+    heights = [0] * width
+    remaining = (1 << width) - 1
+
+    # Top to bottom, until every column has been found
+    for row_id in xrange(len(rows) - 1, -1, -1):
+        found = rows[row_id] & remaining
+        if not found:
+            continue
+
+        remaining &= ~found
+        column = 0
+        while found:
+            if found & 1:
+                heights[column] = row_id + 1
+            found >>= 1
+            column += 1
+
+        if not remaining:
+            break
+
+    return heights
+
+
+def bottom_profile(piece_rows):
+    """ Returns the row of the lowest square in each column of a piece,
+    relative to the bottom of the piece. None for empty columns """
+    profile = []
+
+    for index, mask in enumerate(piece_rows):
+        column = 0
+        while mask:
+            if mask & 1:
+                if column >= len(profile):
+                    profile.extend([None] * (column + 1 - len(profile)))
+                if profile[column] is None:
+                    profile[column] = index
+            mask >>= 1
+            column += 1
+
+    return profile
+
+
+def is_rectilinear(coords):
+    """ Whether a shape's coordinates all lie on the unit grid, and each of
+    its edges is either horizontal or vertical """
+
+    # Include the closing edge, in case the ring isn't closed
+    edges = zip(coords, coords[1:] + coords[:1])
+
+    for (x1, y1), (x2, y2) in edges:
+        if x1 != int(x1) or y1 != int(y1):
+            return False
+
+        if x1 != x2 and y1 != y2:
+            return False
+
+    return True
+
+
+def rasterise(rings):
+    """ Return the row bitmasks of the unit squares covered by a shape,
+    relative to the bottom left corner of its bounds.
+
+    The shape is given as a list of rings (lists of coordinates), and a
+    square is covered when its centre lies inside an odd number of rings.
+    """
+
+    coords = [(int(round(x)), int(round(y))) for ring in rings for x, y in ring]
+    if not coords:
+        return []
+
+    x_min = min(x for x, y in coords)
+    x_max = max(x for x, y in coords)
+    y_min = min(y for x, y in coords)
+    y_max = max(y for x, y in coords)
+
+    edges = []
+    for ring in rings:
+        ring = [(int(round(x)), int(round(y))) for x, y in ring]
+        edges.extend(zip(ring, ring[1:] + ring[:1]))
+
+    rows = []
+    for bottom in xrange(y_min, y_max):
+        centre_y = bottom + 0.5
+        mask = 0
+
+        for left in xrange(x_min, x_max):
+            centre_x = left + 0.5
+            inside = False
+
+            # Cast a ray to the right, counting edge crossings
+            for (x1, y1), (x2, y2) in edges:
+                if (y1 > centre_y) != (y2 > centre_y):
+                    crossing_x = x1 + (centre_y - y1) * (x2 - x1) / float(y2 - y1)
+                    if crossing_x > centre_x:
+                        inside = not inside
+
+            if inside:
+                mask |= 1 << (left - x_min)
+
+        rows.append(mask)
+
+    return rows
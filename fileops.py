@@ -11,30 +11,79 @@
 # Licence:     MIT
 #-------------------------------------------------------------------------
 
+from array import array
+import mmap
+import os
+from string import maketrans
+
 from shapeops import valid_shape_id
 
+chunk_size = 1 << 20
+""" Bytes of an input file parsed at a time """
+
 
 def read_input_file(filename):
     """Read input file and populate a list of recognised pieces."""
+    return read_piece_ids(filename).tolist()
+
+
+def read_piece_ids(filename):
+    """Read input file into a compact array('B') of recognised pieces."""
+    ids = array('B')
+
+    for chunk in iter_piece_id_chunks(filename):
+        ids.extend(chunk)
 
-    # An empty list to contain our input numbers
-    numbers = []
+    return ids
+
+
+def iter_piece_id_chunks(filename, size=chunk_size):
+    """Yield an array('B') of the recognised pieces in each chunk of an
+    input file. The file is memory mapped rather than read."""
+
+    translation, deletions = piece_id_tables()
 
     # Open input file in read only mode
-    with open(filename, 'r') as f:
-        # Iterate through each line in the file
-        for line in f:
-            # Use list comprehension to filter only character digits
-            # Then convert each character to an integer
-            digitsonly = [int(char) for char in line if char.isdigit()]
+    with open(filename, 'rb') as f:
+        # Empty files can't be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return
 
-            # Strip out zeros
-            nozeros = [i for i in digitsonly if valid_shape_id(i)]
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
-            # And add these numbers to the list
-            numbers.extend(nozeros)
+        try:
+            # Every piece is one character, so chunks can split anywhere
+            for start in xrange(0, len(data), size):
+                chunk = data[start:start + size]
+                yield array('B', chunk.translate(translation, deletions))
+        finally:
+            data.close()
 
-    return numbers
+
+def piece_id_tables():
+    """Return a translation table from digit characters to their values,
+    and the characters to delete - everything but recognised piece IDs."""
+
+    digits = '0123456789'
+    valid = ''.join(char for char in digits if valid_shape_id(int(char)))
+
+    translation = maketrans(digits, ''.join(chr(i) for i in xrange(10)))
+    deletions = ''.join(chr(i) for i in xrange(256) if chr(i) not in valid)
+
+    return translation, deletions
+
+
+def iter_input_numbers(f):
+    """Yield the recognised piece numbers of each line of an open file, as
+    soon as the line can be read. Works on pipes which are still being
+    written to."""
+
+    translation, deletions = piece_id_tables()
+
+    # Read a line at a time - iterating over the file reads ahead
+    for line in iter(f.readline, ''):
+        for number in array('B', line.translate(translation, deletions)):
+            yield number
 
 
 def write_output_file(filename, output):
@@ -42,3 +91,56 @@ def write_output_file(filename, output):
     # Open output file in write mode
     with open(filename, 'wb') as f:
         f.write(output)
+
+
+def write_output_lines(filename, lines):
+    """Write each line of output as soon as it is given, so the file can
+    be read while lines are still being worked out."""
+
+    # Open output file in write mode
+    with open(filename, 'wb') as f:
+        for line in lines:
+            f.write(line + '\n')
+            f.flush()
+
+
+def read_output_file(filename):
+    """Read the moves written by write_output_file or write_output_lines, as
+    a list of (piece number, rotation, left) tuples. Raises ValueError if
+    a line isn't a move."""
+
+    moves, error = read_output_moves(filename)
+
+    if error is not None:
+        raise ValueError('Line {} of {}: {}'.format(error[0], filename,
+                                                    error[1]))
+
+    return moves
+
+
+def read_output_moves(filename):
+    """Read the moves of an output file up to the first line which isn't a
+    move. Returns the list of (piece number, rotation, left) tuples, and the
+    (line number, reason) of the line which isn't a move, or None."""
+
+    moves = []
+
+    with open(filename, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            fields = line.split()
+
+            # Skip blank lines
+            if not fields:
+                continue
+
+            if len(fields) != 3:
+                return moves, (line_number, 'expected 3 numbers, found {}'
+                               .format(len(fields)))
+
+            try:
+                moves.append(tuple(int(field) for field in fields))
+            except ValueError:
+                return moves, (line_number, '{!r} is not a whole number'
+                               .format(line.strip()))
+
+    return moves, None
@@ -11,13 +11,21 @@
 # Licence:     MIT
 #-------------------------------------------------------------------------
 
+import multiprocessing
+
 from matplotlib import pyplot
 from descartes.patch import PolygonPatch
 
+from raster import save_frame
+
 shape_edge_colour = '#000000'
 shape_alpha = 0.8
 id_font_size = 10
 
+render_modes = ('none', 'final', 'every-step')
+""" When to plot a game being solved - never, once it's solved, or after
+every move """
+
 
 def plot_game(game, filename=None):
     """Plots the tetris game.
@@ -94,3 +102,49 @@ def plot_piece(ax, piece):
                 horizontalalignment='center',
                 verticalalignment='center',
                 size=id_font_size)
+
+
+class RenderProcess(object):
+
+    """Plot games to file in a background process.
+
+    Games are sent to the process through a queue, so plotting never holds
+    up the caller. close() waits for every plot to be saved.
+
+    Keyword arguments:
+    plotter -- name of the function to plot with, from plotters
+
+    """
+
+    def __init__(self, plotter='matplotlib'):
+        self.queue = multiprocessing.Queue()
+
+        self.process = multiprocessing.Process(target=render_games,
+                                               args=(self.queue, plotter))
+        self.process.daemon = True
+        self.process.start()
+
+    def plot(self, game, filename):
+        """ Queue a game to be plotted to filename. The game mustn't be
+        changed afterwards - see TetrisGame.frame() """
+        self.queue.put((game, filename))
+
+    def close(self):
+        """ Wait for every game queued to be plotted """
+        self.queue.put(None)
+        self.process.join()
+
+
+def render_games(queue, plotter='matplotlib'):
+    """ Plot each game and filename from the queue, until given None """
+    plot = plotters[plotter]
+
+    for game, filename in iter(queue.get, None):
+        plot(game, filename)
+
+
+plotters = {
+    'matplotlib': plot_game,
+    'raster': save_frame,
+}
+""" Functions which plot a game to a PNG file, by name """
@@ -0,0 +1,415 @@
+#-------------------------------------------------------------------------
+# Name:        Raster Frames
+# Purpose:     Draw the game board straight into an array of pixels and
+#              save it as a PNG or GIF, without matplotlib
+#
+# Version:     Python 2.7
+#
+# Author:      Tetris-AI contributors
+#
+# Created:     18/10/2026
+# Copyright:   (c) Tetris-AI contributors 2026
+# Licence:     MIT
+#-------------------------------------------------------------------------
+
+import struct
+import zlib
+from itertools import chain
+
+import numpy as np
+
+from shapeops import Pieces
+
+"""
+Houses a lightweight alternative to plotting.plot_game, for saving many
+frames quickly.
+
+Each square of the board is drawn as a block of scale by scale pixels. Pieces
+on the unit grid are filled from their row bitmasks, and other pieces by
+testing which pixel centres lie inside their polygons. Pieces are outlined,
+but unlike plot_game there are no axes, title or piece IDs.
+
+Frames are drawn as indices into one palette of every colour used, so many
+frames can be written to a GIF or PNG as they are drawn.
+
+"""
+
+scale = 20
+""" Pixels along each side of a square """
+
+background_colour = (255, 255, 255)
+grid_colour = (200, 200, 200)
+edge_colour = (0, 0, 0)
+shape_alpha = 0.8
+
+# Palette indices of the colours which aren't pieces - see frame_palette
+background_index = 0
+grid_index = 1
+edge_index = 2
+
+
+def hex_to_rgb(colour):
+    """ Returns the (red, green, blue) of a hex colour like '#ff0000' """
+    colour = colour.lstrip('#')
+    return tuple(int(colour[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def frame_palette():
+    """ Returns the colours of raster frames, as an array [index, channel]
+    of RGB bytes, and a dictionary of the palette index of each piece colour.
+
+    The background, grid and edge colours come first, then each colour of
+    Pieces.piece_colours, blended with the background as plot_game does.
+    """
+    background = np.array(background_colour, dtype=float)
+
+    colours = [background_colour, grid_colour, edge_colour]
+    indices = {}
+
+    for colour in sorted(set(Pieces.piece_colours.values())):
+        indices[colour] = len(colours)
+        colours.append(shape_alpha * np.array(hex_to_rgb(colour)) +
+                       (1 - shape_alpha) * background)
+
+    return np.array(colours).astype(np.uint8), indices
+
+
+def render_frame(game, scale=scale, board_height=None):
+    """ Returns an array [row, column, channel] of the RGB pixels of a game,
+    with the top of the board in the first row. See render_indices """
+    palette, colour_indices = frame_palette()
+    return palette[render_indices(game, scale, board_height, colour_indices)]
+
+
+def render_indices(game, scale=scale, board_height=None, colour_indices=None):
+    """ Returns an array [row, column] of the palette index of each pixel of
+    a game, with the top of the board in the first row.
+
+    Keyword arguments:
+    board_height -- squares to draw the board high, by default a little
+                    higher than the game
+    colour_indices -- the palette index of each piece colour, as given by
+                      frame_palette
+
+    """
+
+    if colour_indices is None:
+        colour_indices = frame_palette()[1]
+
+    if board_height is None:
+        board_height = int(max(game.height + 2, 8))
+    height = board_height * scale
+    width = int(game.width) * scale
+
+    # Index + 1 of the piece covering each pixel, from the bottom up
+    owner = np.zeros((height, width), dtype=np.int32)
+
+    for index, piece in enumerate(game.pieces):
+        if game.board is not None:
+            covered = grid_pixels(piece, scale)
+        else:
+            covered = polygon_pixels(piece.polygon, scale)
+
+        if covered is None:
+            continue
+
+        rows, columns = covered
+        keep = (rows < height) & (columns < width)
+        owner[rows[keep], columns[keep]] = index + 1
+
+    piece_indices = [background_index]
+    piece_indices.extend(colour_indices[piece.colour] for piece in game.pieces)
+
+    indices = np.array(piece_indices, dtype=np.uint8)[owner]
+
+    # Grid lines between the squares
+    grid = np.zeros((height, width), dtype=bool)
+    grid[::scale, :] = True
+    grid[:, ::scale] = True
+    indices[grid & (owner == 0)] = grid_index
+
+    # Outline each piece where the pixel next to it belongs to another
+    edges = np.zeros((height, width), dtype=bool)
+    edges[1:, :] |= owner[1:, :] != owner[:-1, :]
+    edges[:-1, :] |= owner[:-1, :] != owner[1:, :]
+    edges[:, 1:] |= owner[:, 1:] != owner[:, :-1]
+    edges[:, :-1] |= owner[:, :-1] != owner[:, 1:]
+    indices[edges & (owner != 0)] = edge_index
+
+    # Images are stored top row first
+    return indices[::-1]
+
+
+def grid_pixels(piece, scale):
+    """ Returns the (rows, columns) of the pixels covered by a piece on the
+    unit grid, from its row bitmasks """
+    min_x, min_y = piece.polygon.bounds[:2]
+    left = int(round(min_x))
+    bottom = int(round(min_y))
+
+    squares = [(bottom + index, left + column)
+               for index, mask in enumerate(piece.rows)
+               for column in xrange(mask.bit_length()) if mask >> column & 1]
+
+    if not squares:
+        return None
+
+    squares = np.array(squares)
+    offsets = np.arange(scale)
+
+    # Every pixel of every square
+    rows = (squares[:, 0, None, None] * scale + offsets[:, None]).repeat(scale, 2)
+    columns = (squares[:, 1, None, None] * scale + offsets[None, :]).repeat(scale, 1)
+
+    return rows.ravel(), columns.ravel()
+
+
+def polygon_pixels(polygon, scale):
+    """ Returns the (rows, columns) of the pixels whose centres lie inside
+    a polygon or multipolygon, by the even-odd rule """
+    if polygon.is_empty:
+        return None
+
+    min_x, min_y, max_x, max_y = [b * scale for b in polygon.bounds]
+    columns = np.arange(int(np.floor(min_x)), int(np.ceil(max_x)))
+    rows = np.arange(int(np.floor(min_y)), int(np.ceil(max_y)))
+
+    centre_x = (columns + 0.5)[None, :]
+    centre_y = (rows + 0.5)[:, None]
+
+    if polygon.type == 'MultiPolygon':
+        polygons = polygon.geoms
+    else:
+        polygons = [polygon]
+
+    rings = []
+    for poly in polygons:
+        rings.append(poly.exterior.coords)
+        rings.extend(interior.coords for interior in poly.interiors)
+
+    inside = np.zeros((len(rows), len(columns)), dtype=bool)
+
+    # Cast a ray to the right of each centre, counting edge crossings
+    for ring in rings:
+        ring = np.array(ring) * scale
+
+        for (x1, y1), (x2, y2) in zip(ring[:-1], ring[1:]):
+            if y1 == y2:
+                continue
+
+            spans = (y1 > centre_y) != (y2 > centre_y)
+            crossing_x = x1 + (centre_y - y1) * (x2 - x1) / (y2 - y1)
+            inside ^= spans & (crossing_x > centre_x)
+
+    found_rows, found_columns = np.nonzero(inside)
+    return rows[found_rows], columns[found_columns]
+
+
+def png_chunk(kind, data):
+    """ Returns a PNG chunk of data, with its length and checksum """
+    crc = zlib.crc32(kind + data) & 0xffffffff
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', crc)
+
+
+def write_png(filename, pixels):
+    """ Save an array [row, column, channel] of RGB bytes as a PNG """
+    height, width = pixels.shape[:2]
+
+    # Each scanline starts with its filter type, 0 for none
+    scanlines = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = pixels.reshape(height, width * 3)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+
+    with open(filename, 'wb') as f:
+        f.write('\x89PNG\r\n\x1a\n')
+        f.write(png_chunk('IHDR', header))
+        f.write(png_chunk('IDAT', zlib.compress(scanlines.tobytes(), 6)))
+        f.write(png_chunk('IEND', ''))
+
+
+def write_png_rows(filename, width, height, palette, blocks):
+    """ Save an image of palette indices as a PNG, writing each block of its
+    rows as soon as it is produced, so the whole image is never held.
+
+    Keyword arguments:
+    width, height -- the size of the image in pixels
+    palette -- array [index, channel] of the RGB bytes of up to 256 indices
+    blocks -- iterable of arrays [row, column] of palette indices, from the
+              top of the image down, height rows in all
+
+    """
+    header = struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)
+    compressor = zlib.compressobj(6)
+
+    with open(filename, 'wb') as f:
+        f.write('\x89PNG\r\n\x1a\n')
+        f.write(png_chunk('IHDR', header))
+        f.write(png_chunk('PLTE', palette.astype(np.uint8).tobytes()))
+
+        for block in blocks:
+            # Each scanline starts with its filter type, 0 for none
+            scanlines = np.zeros((len(block), width + 1), dtype=np.uint8)
+            scanlines[:, 1:] = block
+
+            # The image data may be split between any number of chunks
+            data = compressor.compress(scanlines.tobytes())
+            if data:
+                f.write(png_chunk('IDAT', data))
+
+        f.write(png_chunk('IDAT', compressor.flush()))
+        f.write(png_chunk('IEND', ''))
+
+
+def write_gif(filename, frames, palette, delay=20):
+    """ Save frames of palette indices, all the same size, as an animated
+    GIF which loops forever.
+
+    frames may be any iterable, such as a generator. Each frame is written
+    as soon as it is produced, so only the one before it is held. After the
+    first frame, only the box of pixels which changed is written.
+
+    Keyword arguments:
+    palette -- array [index, channel] of the RGB bytes of up to 256 indices
+    delay -- hundredths of a second to show each frame
+
+    """
+    if len(palette) > 256:
+        raise ValueError("GIFs can't have more than 256 colours")
+
+    # The palette size is a power of two, at least 4
+    code_size = max(2, int(len(palette) - 1).bit_length())
+    colour_table = np.zeros((1 << code_size, 3), dtype=np.uint8)
+    colour_table[:len(palette)] = palette
+
+    frames = iter(frames)
+    first = next(frames)
+    height, width = first.shape
+
+    with open(filename, 'wb') as f:
+        f.write('GIF89a')
+        f.write(struct.pack('<HHBBB', width, height,
+                            0xf0 | (code_size - 1), 0, 0))
+        f.write(colour_table.tobytes())
+
+        # Loop forever
+        f.write('\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00')
+
+        previous = None
+
+        for frame in chain([first], frames):
+            top, left, bottom, right = changed_box(previous, frame)
+
+            # Graphic control extension, for the delay. Each frame is drawn
+            # over the one before
+            f.write(struct.pack('<4sHBB', '\x21\xf9\x04\x04', delay, 0, 0))
+
+            # Image descriptor, covering the changed box
+            f.write(struct.pack('<BHHHHB', 0x2c, left, top,
+                                right - left, bottom - top, 0))
+
+            box = frame[top:bottom, left:right]
+            data = lzw_encode(box.ravel().tolist(), code_size)
+
+            # Data is written in blocks of up to 255 bytes
+            f.write(chr(code_size))
+            for start in xrange(0, len(data), 255):
+                block = data[start:start + 255]
+                f.write(chr(len(block)) + block)
+            f.write('\x00')
+
+            previous = frame
+
+        f.write(';')
+
+
+def changed_box(previous, frame):
+    """ Returns the (top, left, bottom, right) of the pixels of frame which
+    differ from the previous frame. The whole frame without a previous one,
+    and a single pixel when nothing has changed """
+    height, width = frame.shape
+
+    if previous is None:
+        return 0, 0, height, width
+
+    changed = frame != previous
+    rows = np.flatnonzero(changed.any(axis=1))
+
+    if not len(rows):
+        return 0, 0, 1, 1
+
+    columns = np.flatnonzero(changed.any(axis=0))
+
+    return (int(rows[0]), int(columns[0]),
+            int(rows[-1]) + 1, int(columns[-1]) + 1)
+
+
+def lzw_encode(indices, min_code_size):
+    """ Returns the GIF LZW compressed bytes of a list of palette indices """
+    clear_code = 1 << min_code_size
+    end_code = clear_code + 1
+
+    code_size = min_code_size + 1
+    next_code = end_code + 1
+    table = {}
+
+    # Each code, with the number of bits it is written in
+    codes = [(clear_code, code_size)]
+    prefix = indices[0]
+
+    for index in indices[1:]:
+        key = prefix << 8 | index
+
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+
+        codes.append((prefix, code_size))
+        prefix = index
+
+        # Codes are written one bit wider once the next code won't fit
+        if next_code >= 1 << code_size:
+            code_size += 1
+
+        if next_code < 4095:
+            table[key] = next_code
+            next_code += 1
+        else:
+            # Table full - start again
+            codes.append((clear_code, code_size))
+            code_size = min_code_size + 1
+            next_code = end_code + 1
+            table = {}
+
+    codes.append((prefix, code_size))
+    if next_code >= 1 << code_size:
+        code_size += 1
+    codes.append((end_code, code_size))
+
+    # Pack the codes, least significant bit first
+    output = bytearray()
+    buffer = 0
+    buffer_bits = 0
+
+    for code, size in codes:
+        buffer |= code << buffer_bits
+        buffer_bits += size
+
+        while buffer_bits >= 8:
+            output.append(buffer & 0xff)
+            buffer >>= 8
+            buffer_bits -= 8
+
+    if buffer_bits:
+        output.append(buffer & 0xff)
+
+    return bytes(output)
+
+
+def save_frame(game, filename):
+    """ Draw the game and save it as a PNG - a faster plot_game """
+    if not filename.lower().endswith('.png'):
+        filename += '.png'
+
+    write_png(filename, render_frame(game))
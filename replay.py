@@ -0,0 +1,189 @@
+#-------------------------------------------------------------------------
+# Name:        Tetris Replay
+# Purpose:     Rebuild a solved game from its input and output files, and
+#              save it as an animation or sprite sheet
+#
+# Version:     Python 2.7
+#
+# Author:      Tetris-AI contributors
+#
+# Created:     18/10/2026
+# Copyright:   (c) Tetris-AI contributors 2026
+# Licence:     MIT
+#-------------------------------------------------------------------------
+#!/usr/bin/env python
+
+import argparse
+from itertools import chain
+
+import numpy as np
+
+from tetris import TetrisGame, TetrisPiece
+from fileops import read_input_file, read_output_file
+from shapeops import all_shapes_rectilinear
+from validate import validate_moves
+from raster import render_indices, frame_palette, background_index
+from raster import write_png_rows, write_gif, scale
+
+"""
+Plays the moves of an output file back on the pieces of its input file,
+without running the AI, so the game can be drawn again at any time.
+
+Frames are drawn with raster.py, one for the empty board and one after each
+move, and saved as an animated GIF or as a sprite sheet PNG. Each frame is
+written as soon as it is drawn, so the number of frames isn't limited by
+memory.
+
+"""
+
+
+def replay(piece_numbers, moves, width=11):
+    """ Yield the game after each move has been made and full rows removed.
+    The same game is yielded each time, changed in place.
+
+    Keyword arguments:
+    piece_numbers -- the pieces, as read by read_input_file
+    moves -- (piece number, rotation, left) of each move, in order, as read
+             by read_output_file. There may be fewer moves than pieces
+    width -- the game width
+
+    """
+    if len(moves) > len(piece_numbers):
+        raise ValueError("{} moves for {} pieces".format(
+            len(moves), len(piece_numbers)))
+
+    pieces = [TetrisPiece(n, i) for i, n in enumerate(piece_numbers)]
+    game = TetrisGame(list(pieces), width=width)
+
+    for piece, (num, rotation, left) in zip(pieces, moves):
+        if num != piece.num:
+            raise ValueError("Move {} is for piece number {}, not {}".format(
+                piece.id, num, piece.num))
+
+        piece.rotate(rotation)
+        game.drop(piece, left)
+        game.check_full_rows()
+
+        yield game
+
+
+def replay_height(piece_numbers, moves, width=11):
+    """ Returns the most rows the game fills after any move. Found from row
+    bitmasks by validate_moves when every shape lies on the unit grid, which
+    is much quicker than replaying the game. Raises ValueError for an
+    illegal move either way """
+    if all_shapes_rectilinear():
+        result = validate_moves(piece_numbers, moves, width)
+
+        if result.illegal_move is not None:
+            raise ValueError("Move {} is illegal - {}".format(
+                result.illegal_move + 1, result.reason))
+
+        return result.max_height
+
+    return max([0] + [game.height
+                      for game in replay(piece_numbers, moves, width)])
+
+
+def render_replay(piece_numbers, moves, width=11, scale=scale):
+    """ Yield a frame of the empty game and of the game after each move,
+    all drawn as high as the highest game. Frames are arrays [row, column]
+    of the indices of frame_palette, each drawn as it is needed """
+    board_height = int(max(replay_height(piece_numbers, moves, width), 6) + 2)
+    colour_indices = frame_palette()[1]
+
+    yield render_indices(TetrisGame(width=width), scale, board_height,
+                         colour_indices)
+
+    for game in replay(piece_numbers, moves, width):
+        yield render_indices(game, scale, board_height, colour_indices)
+
+
+def sprite_sheet_rows(frames, columns=10):
+    """ Yield the frames tiled left to right, then top to bottom, one row of
+    tiles at a time. Spaces left in the last row are background """
+    row = []
+
+    for frame in frames:
+        row.append(frame)
+
+        if len(row) == columns:
+            yield np.hstack(row)
+            row = []
+
+    if row:
+        blank = np.full_like(row[0], background_index)
+        yield np.hstack(row + [blank] * (columns - len(row)))
+
+
+def write_sprite_sheet(filename, frames, num_frames, columns=10):
+    """ Save num_frames frames as a sprite sheet PNG, writing each row of
+    tiles as soon as it is filled """
+    frames = iter(frames)
+    first = next(frames)
+
+    height, width = first.shape
+    columns = min(columns, num_frames)
+    rows = -(-num_frames // columns)
+
+    write_png_rows(filename, columns * width, rows * height,
+                   frame_palette()[0],
+                   sprite_sheet_rows(chain([first], frames), columns))
+
+
+def replay_files(input_filename, output_filename, animation_filename,
+                 width=11, scale=scale, delay=20, columns=10):
+    """ Replay the moves of an output file, saving the frames as an animated
+    GIF or a sprite sheet PNG, chosen by the animation filename """
+
+    piece_numbers = read_input_file(input_filename)
+    moves = read_output_file(output_filename)
+
+    print '{} pieces and {} moves loaded'.format(len(piece_numbers), len(moves))
+
+    frames = render_replay(piece_numbers, moves, width, scale)
+    num_frames = len(moves) + 1
+
+    if animation_filename.lower().endswith('.gif'):
+        write_gif(animation_filename, frames, frame_palette()[0], delay)
+    else:
+        write_sprite_sheet(animation_filename, frames, num_frames, columns)
+
+    print '{} frames saved to {}'.format(num_frames, animation_filename)
+
+
+def parse_commandline_args():
+    parser = argparse.ArgumentParser(description='Tetris-AI replay')
+
+    parser.add_argument('input', type=str,
+                        help='the input filename containing Tetris piece IDs')
+
+    parser.add_argument('output', type=str,
+                        help='the output filename containing the moves made')
+
+    parser.add_argument('animation', type=str,
+                        help="""the filename to save to - an animated .gif,
+        or a .png sprite sheet""")
+
+    parser.add_argument('--width', dest='width', type=int, default=11,
+                        help='Width of the game the moves were made in.')
+
+    parser.add_argument('--scale', dest='scale', type=int, default=scale,
+                        help='Pixels along each side of a square.')
+
+    parser.add_argument('--delay', dest='delay', type=int, default=20,
+                        help='Hundredths of a second to show each GIF frame.')
+
+    parser.add_argument('--columns', dest='columns', type=int, default=10,
+                        help='Frames in each row of a sprite sheet.')
+
+    args = parser.parse_args()
+
+    if not args.animation.lower().endswith(('.gif', '.png')):
+        parser.error('the animation must be a .gif or .png file')
+
+    replay_files(args.input, args.output, args.animation, args.width,
+                 args.scale, args.delay, args.columns)
+
+if __name__ == '__main__':
+    parse_commandline_args()
@@ -15,16 +15,58 @@ from shapely.geometry import Polygon, box
 from shapely.affinity import translate, rotate as polygon_rotate
 from shapely.ops import cascaded_union
 
+from bitboard import is_rectilinear, rasterise, bottom_profile
+
 """
 Houses all code for the shape operations used by tetris.py
 
 """
 
 
+class ShapeTable(dict):
+
+    """A dictionary of shape coordinates by piece number, which counts how
+    many times it has been changed. The ShapeCatalog of the table is only
+    built again when this count changes.
+
+    Coordinates should be replaced, not changed in place.
+    """
+
+    version = 0
+
+    def __setitem__(self, num, coords):
+        dict.__setitem__(self, num, coords)
+        self.version += 1
+
+    def __delitem__(self, num):
+        dict.__delitem__(self, num)
+        self.version += 1
+
+    def clear(self):
+        dict.clear(self)
+        self.version += 1
+
+    def pop(self, *args):
+        self.version += 1
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        self.version += 1
+        return dict.popitem(self)
+
+    def setdefault(self, *args):
+        self.version += 1
+        return dict.setdefault(self, *args)
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self.version += 1
+
+
 class Pieces(object):
 
     # List of shape coordinates - (x,y)
-    piece_shapes = {
+    piece_shapes = ShapeTable({
         1: [(0, 0), (1, 0), (1, 4), (0, 4), (0, 0)],
         2: [(0, 0), (2, 0), (2, 2), (0, 2), (0, 0)],
         3: [(0, 0), (0, 3), (1, 3), (1, 2), (2, 2), (2, 1), (1, 1), (1, 0), (0, 0)],
@@ -32,7 +74,7 @@ class Pieces(object):
         5: [(0, 2), (0, 3), (2, 3), (2, 0), (1, 0), (1, 2), (0, 2)],
         6: [(0, 1), (0, 3), (1, 3), (1, 2), (2, 2), (2, 0), (1, 0), (1, 1), (0, 1)],
         7: [(0, 0), (0, 2), (1, 2), (1, 3), (2, 3), (2, 1), (1, 1), (1, 0), (0, 0)],
-    }
+    })
 
     # Hex colours for plotting
     piece_colours = {
@@ -46,6 +88,93 @@ class Pieces(object):
     }
 
 
+class ShapeRotation(object):
+
+    """Hold the geometry of a shape in one rotation, moved so that the
+    bottom left corner of its bounds is at the origin.
+
+    Treated as immutable, so it is shared rather than copied.
+
+    Keyword arguments:
+    polygon -- the rotated shape
+    rectilinear -- whether the shape lies on the unit grid, so has rows
+
+    """
+
+    def __init__(self, polygon, rectilinear):
+        x_min, y_min, x_max, y_max = polygon.bounds
+
+        self.polygon = move(polygon, -x_min, -y_min)
+        self.bounds = self.polygon.bounds
+
+        self.width = int(x_max - x_min)
+        self.height = int(y_max - y_min)
+        self.area = self.polygon.area
+
+        # Row bitmasks and the lowest square of each column
+        if rectilinear:
+            self.rows = get_polygon_rows(self.polygon)
+            self.bottom_profile = bottom_profile(self.rows)
+        else:
+            self.rows = None
+            self.bottom_profile = None
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class ShapeCatalog(object):
+
+    """Hold every rotation of every shape in a table of piece shapes,
+    along with which of those rotations are useful.
+
+    Keyword arguments:
+    piece_shapes -- dictionary of shape coordinates by piece number
+
+    """
+
+    def __init__(self, piece_shapes):
+        self.rotations = {}
+        self.useful_rotations = {}
+
+        for num, coords in piece_shapes.items():
+            shape = Polygon(coords)
+            rectilinear = is_rectilinear(coords)
+
+            self.rotations[num] = [
+                ShapeRotation(rotate(shape, angle_id * 90), rectilinear)
+                for angle_id in range(4)]
+
+            self.useful_rotations[num] = get_useful_rotations(shape)
+
+
+_catalog = None
+_catalog_table = None
+_catalog_version = None
+
+
+def get_shape_catalog():
+    """ Return the ShapeCatalog of Pieces.piece_shapes.
+        Only built again when the table of shapes is replaced or changed
+    """
+    global _catalog, _catalog_table, _catalog_version
+
+    shapes = Pieces.piece_shapes
+
+    if shapes is _catalog_table and shapes.version == _catalog_version:
+        return _catalog
+
+    # A plain dictionary put in place of the table is tracked from now on
+    if not isinstance(shapes, ShapeTable):
+        shapes = Pieces.piece_shapes = ShapeTable(shapes)
+
+    _catalog = ShapeCatalog(shapes)
+    _catalog_table = shapes
+    _catalog_version = shapes.version
+
+    return _catalog
+
+
 def get_shape_polygon(num):
     return Polygon(Pieces.piece_shapes[num])
 
@@ -61,6 +190,13 @@ def valid_shape_id(num):
     return num in Pieces.piece_colours and num in Pieces.piece_shapes
 
 
+def all_shapes_rectilinear():
+    """ Check whether every shape lies on the unit grid with only horizontal
+        and vertical edges, so the game can be held in a BitBoard
+    """
+    return all(is_rectilinear(coords) for coords in Pieces.piece_shapes.values())
+
+
 def num_useful_rotations(num):
     """ Determine which rotation states are unique
 
@@ -69,8 +205,11 @@ def num_useful_rotations(num):
         piece 2 (square) = [0]
         piece 3          = [0, 90, 180, 270]
     """
+    return get_useful_rotations(get_shape_polygon(num))
+
 
-    shape = get_shape_polygon(num)
+def get_useful_rotations(shape):
+    """ Determine which rotation states of a shape polygon are unique """
 
     unique_rotation_states = [0]
     unique_rotation_shapes = [shape]
@@ -121,6 +260,21 @@ def get_height_box(width, height):
     return box(0, 0, width, height)
 
 
+def get_polygon_rows(polygon):
+    """Return the row bitmasks of the unit squares covered by polygon"""
+    if polygon.type == 'MultiPolygon':
+        polygons = polygon.geoms
+    else:
+        polygons = [polygon]
+
+    rings = []
+    for poly in polygons:
+        rings.append(list(poly.exterior.coords))
+        rings.extend(list(interior.coords) for interior in poly.interiors)
+
+    return rasterise(rings)
+
+
 def combine_split(shape):
     """Combine a MultiPolygon into a single shape"""
     shape1, shape2 = shape.geoms
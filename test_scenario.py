@@ -19,6 +19,7 @@ from random import shuffle
 from tetris import TetrisGame, TetrisPiece
 from plotting import plot_game
 from shapeops import Pieces
+from ai import Weightings
 
 """
 Game scenario tests to verify correct execution of program modules.
@@ -61,6 +62,100 @@ def test_scenario_1():
     assert_equals(game.height, 1)
 
 
+def scenario_1_game(name):
+    """ Returns a new game of the scenario 1 pieces """
+
+    pieces = [
+        TetrisPiece(5, 'L'),
+        TetrisPiece(4, 'J'),
+        TetrisPiece(2, 'O'),
+        TetrisPiece(1, 'I'),
+    ]
+
+    game = TetrisGame(pieces, width=6)
+    game.status = "scenario/" + name
+
+    return game
+
+
+def solve_scenario_1(name, **settings):
+    """ Solves scenario 1 with the solver settings given, and returns the
+    output """
+
+    game = scenario_1_game(name)
+    game.solve(Weightings(**settings))
+
+    # Check that there were moves for each piece
+    assert_equals(len(game.moves), 4)
+
+    # Check game height is equal to 1
+    assert_equals(game.height, 1)
+
+    return game.get_output()
+
+
+# @attr('skip')
+def test_scenario_1_processes():
+    """ Evaluating moves in worker processes makes the same moves as threads """
+
+    expected = solve_scenario_1('scenario_1_threads')
+
+    output = solve_scenario_1('scenario_1_processes', num_workers=2,
+                              backend='processes')
+    assert_equals(output, expected)
+
+
+# @attr('skip')
+def test_scenario_1_numpy():
+    """ Evaluating moves in batches makes the same moves as threads """
+
+    expected = solve_scenario_1('scenario_1_threads')
+
+    output = solve_scenario_1('scenario_1_numpy', backend='numpy')
+    assert_equals(output, expected)
+
+
+# @attr('skip')
+def test_scenario_1_beam():
+    """ Beam search makes the same moves as the tree search """
+
+    expected = solve_scenario_1('scenario_1_threads')
+
+    output = solve_scenario_1('scenario_1_beam', solver='beam', beam_width=4)
+    assert_equals(output, expected)
+
+
+# @attr('skip')
+def test_scenario_1_iter_solve():
+    """ Each move is made on the game as soon as it is yielded """
+
+    expected = solve_scenario_1('scenario_1_threads')
+
+    for solver in ['tree', 'beam']:
+        game = scenario_1_game("scenario_1_iter_{}".format(solver))
+
+        for i, move in enumerate(game.iter_solve(Weightings(solver=solver))):
+            assert_equals(len(game.moves), i + 1)
+            assert_equals(game.get_output().split('\n')[-1],
+                          '{0.num} {0.rotation} {0.left:.0f}'.format(move))
+
+        assert_equals(game.get_output(), expected)
+        assert_equals(game.height, 1)
+
+
+# @attr('skip')
+def test_scenario_1_time_per_move():
+    """ A move is made for each piece, however little time there is """
+
+    expected = solve_scenario_1('scenario_1_threads')
+
+    solve_scenario_1('scenario_1_time_0', time_per_move=0)
+
+    # With plenty of time, the full lookahead is searched
+    output = solve_scenario_1('scenario_1_time_60', time_per_move=60)
+    assert_equals(output, expected)
+
+
 # @attr('skip')
 def test_scenario_2():
 
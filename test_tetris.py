@@ -12,15 +12,30 @@
 #-------------------------------------------------------------------------
 
 from random import randint, choice
+import gc
+import os
+import sys
+
+import numpy as np
 
 import nose
 from nose.tools import timed, raises, assert_equals, assert_true, assert_false
+from nose.tools import assert_not_equal, assert_almost_equal, assert_raises
 from nose.plugins.attrib import attr
 
 from tetris import TetrisGame, TetrisPiece
-from plotting import plot_game
-from fileops import read_input_file
-from shapeops import num_useful_rotations, merge
+from plotting import plot_game, RenderProcess, pyplot
+from raster import render_frame, save_frame, hex_to_rgb, frame_palette
+from raster import changed_box
+from replay import replay, replay_height, render_replay, write_sprite_sheet
+from validate import validate_moves, validate_files
+from fileops import read_input_file, read_piece_ids, iter_piece_id_chunks
+from shapeops import num_useful_rotations, merge, get_shape_catalog, Pieces
+from ai import TranspositionTable, MoveCache, Move, Weightings, BatchEvaluator
+from ai import ProcessEvaluator
+from ai import Step, start_search, get_possible_moves, evaluate_moves
+from ai import merge_duplicate_moves, get_best_moves, iter_best_moves
+from ai import MoveRecord, StepSearch, StepCounter
 
 """
 Unit tests to verify correct execution of program modules and to check
@@ -39,6 +54,20 @@ def test_read_input_file():
     assert_equals(actual, expected)
 
 
+def test_read_piece_ids():
+    """ Test parsing an input file in chunks skips invalid IDs and other
+    characters, wherever the chunks split """
+    with open('test/test_read_piece_ids.txt', 'w') as f:
+        f.write('1 2, 3\n0 8 9 x 45\r\n\n67 ')
+
+    expected = [1, 2, 3, 4, 5, 6, 7]
+    assert_equals(read_piece_ids('test/test_read_piece_ids.txt').tolist(), expected)
+
+    chunks = list(iter_piece_id_chunks('test/test_read_piece_ids.txt', 3))
+    assert_equals(len(chunks), 8)
+    assert_equals([n for chunk in chunks for n in chunk], expected)
+
+
 def test_get_output():
     """ Test TetrisGame.get_output() """
     game = TetrisGame()
@@ -192,6 +221,49 @@ def test_num_useful_rotations():
         assert_equals(num_useful_rotations(i), expected_useful_rotations[i])
 
 
+def test_shape_catalog():
+    """ Test the precalculated rotations of each shape """
+
+    catalog = get_shape_catalog()
+
+    assert_equals(catalog.useful_rotations[1], [0, 1])
+    assert_equals(catalog.useful_rotations[2], [0])
+
+    # I on its side
+    shape = catalog.rotations[1][1]
+    assert_equals(shape.bounds, (0, 0, 4, 1))
+    assert_equals((shape.width, shape.height, shape.area), (4, 1, 4))
+    assert_equals(shape.rows, [0b1111])
+    assert_equals(shape.bottom_profile, [0, 0, 0, 0])
+
+    # T pointing down, with its middle column lower than the others
+    shape = catalog.rotations[3][3]
+    assert_equals(shape.rows, [0b010, 0b111])
+    assert_equals(shape.bottom_profile, [1, 0, 1])
+
+    # Only built again when the shapes change
+    assert_true(get_shape_catalog() is catalog)
+
+    Pieces.piece_shapes[8] = [(0, 0), (3, 0), (3, 1), (0, 1), (0, 0)]
+    try:
+        assert_true(get_shape_catalog() is not catalog)
+        assert_equals(get_shape_catalog().useful_rotations[8], [0, 1])
+        assert_equals(get_shape_catalog().rotations[8][1].rows, [1, 1, 1])
+    finally:
+        del Pieces.piece_shapes[8]
+
+    # Or when the whole table is replaced
+    shapes = Pieces.piece_shapes
+    Pieces.piece_shapes = {1: shapes[1]}
+    try:
+        assert_equals(sorted(get_shape_catalog().rotations), [1])
+        assert_true(get_shape_catalog() is get_shape_catalog())
+    finally:
+        Pieces.piece_shapes = shapes
+
+    assert_equals(sorted(get_shape_catalog().rotations), range(1, 8))
+
+
 def test_merge_pieces():
     """ Test merging pieces together """
 
@@ -579,6 +651,705 @@ def test_count_blocks_above_height_3():
     plot_game(g, 'test/test_count_blocks_above_height_3')
 
 
+def test_bitboard_matches_polygons():
+    """ Test the bitboard gives the same drops, rows and gaps as polygons """
+
+    polygon_game = TetrisGame(width=7, bitboard=False)
+    bitboard_game = TetrisGame(width=7)
+
+    assert_true(polygon_game.board is None)
+    assert_true(bitboard_game.board is not None)
+
+    for i in range(30):
+        num = randint(1, 7)
+        rotation = randint(0, 3)
+
+        polygon_piece = TetrisPiece(num, i, rotation)
+        bitboard_piece = TetrisPiece(num, i, rotation)
+        left = randint(0, 7 - polygon_piece.width)
+
+        previous_height = polygon_game.height
+        polygon_game.drop(polygon_piece, left)
+        bitboard_game.drop(bitboard_piece, left)
+
+        assert_equals(bitboard_piece.bottom, polygon_piece.bottom)
+        assert_equals(bitboard_game.check_full_rows(),
+                      polygon_game.check_full_rows())
+        assert_equals(bitboard_game.height, polygon_game.height)
+        assert_equals(bitboard_game.count_gaps(), polygon_game.count_gaps())
+
+        centroid, area = polygon_game.calculate_blocks_above_height(
+            previous_height)
+        expected = bitboard_game.calculate_blocks_above_height(previous_height)
+        assert_equals(expected[1], area)
+        assert_true(abs(expected[0] - centroid) < 1e-9)
+
+    plot_game(bitboard_game, 'test/test_bitboard_matches_polygons')
+
+
+def test_bitboard_rows():
+    """ Test rasterising shapes into row bitmasks """
+
+    # I on its side, and on its end
+    assert_equals(TetrisPiece(1, rotation=1).rows, [0b1111])
+    assert_equals(TetrisPiece(1).rows, [1, 1, 1, 1])
+
+    # T pointing right, rows from the bottom up
+    assert_equals(TetrisPiece(3).rows, [0b01, 0b11, 0b01])
+
+
+def test_skyline():
+    """ Test the column skyline follows drops and removed rows """
+
+    g = TetrisGame(width=4)
+    g.drop(TetrisPiece(2, 'O'), 0)
+    g.drop(TetrisPiece(1, 'I', rotation=1), 0)
+
+    assert_equals(g.board.skyline, [3, 3, 3, 3])
+    assert_equals(g.check_full_rows(), 1)
+    assert_equals(g.board.skyline, [2, 2, 0, 0])
+
+    # T hangs over the right column, leaving a gap beneath it
+    g.drop(TetrisPiece(3, 'T'), 2)
+    assert_equals(g.board.skyline, [2, 2, 3, 2])
+    assert_equals(g.count_gaps(), 1)
+
+    # The right column drops by two when the middle row is removed
+    assert_equals(g.check_full_rows(), 1)
+    assert_equals(g.board.skyline, [1, 1, 2, 0])
+    assert_equals(g.height, 2)
+
+
+def test_drop_stats():
+    """ Test the stats of a drop from one pass over the bitboard match
+    dropping into a copy of the game """
+
+    for i in range(10):
+        g = TetrisGame(width=5)
+        for j in range(randint(0, 12)):
+            piece = TetrisPiece(randint(1, 7), j, randint(0, 3))
+            g.drop(piece, randint(0, 5 - piece.width))
+            g.check_full_rows()
+
+        previous_height = g.height
+
+        for num in range(1, 8):
+            for rotation in range(4):
+                piece = TetrisPiece(num, 'P', rotation)
+                for left in range(6 - piece.width):
+                    found = g.board.drop_stats(piece.rows, left)
+
+                    temp_game = g.copy()
+                    temp_game.drop(piece.copy(), left)
+                    rows_removed = temp_game.check_full_rows()
+
+                    if temp_game.pieces[-1].id != 'P':
+                        # Removed completely
+                        assert_true(found is None)
+                        continue
+
+                    centroid, area = \
+                        temp_game.calculate_blocks_above_height(
+                            previous_height)
+
+                    expected = (rows_removed, centroid, area,
+                                temp_game.count_gaps(), temp_game.height,
+                                temp_game.pieces[-1].polygon.centroid.y)
+
+                    assert_equals(found, expected)
+
+
+def test_incremental_merged_pieces():
+    """ Test merged pieces kept up to date by drops and removed rows
+    match merging every piece again """
+
+    g = TetrisGame(width=5, bitboard=False)
+
+    for i in range(20):
+        piece = TetrisPiece(randint(1, 7), i, randint(0, 3))
+        g.drop(piece, randint(0, 5 - piece.width))
+        g.check_full_rows()
+
+        expected = merge(g.pieces)
+        assert_equals(g.merged_pieces.symmetric_difference(expected).area, 0)
+        assert_equals(g.height, g.calculate_height())
+
+
+def test_copy_game():
+    """ Test changes to a copy of a game don't change the original """
+
+    for bitboard in [True, False]:
+        g = TetrisGame(width=4, bitboard=bitboard)
+        g.drop(TetrisPiece(2, 'O'), 0)
+        g.drop(TetrisPiece(1, 'I1'), 2)
+
+        g2 = g.copy()
+        g2.drop(TetrisPiece(1, 'I2'), 3)
+
+        # Removing the two full rows splits and moves the shared pieces
+        assert_equals(g2.check_full_rows(), 2)
+        assert_equals(g2.height, 2)
+
+        assert_equals(g.height, 4)
+        assert_equals(len(g.pieces), 2)
+        assert_equals(g.pieces[0].polygon.bounds, (0, 0, 2, 2))
+        assert_equals(g.pieces[1].polygon.bounds, (2, 0, 3, 4))
+        assert_equals(g.count_gaps(), 0)
+
+
+def test_board_key():
+    """ Test bitboards reached by different orders of moves have the same key """
+
+    g1 = TetrisGame(width=6, bitboard=True)
+    g1.drop(TetrisPiece(1, 'I1'), 0)
+    g1.drop(TetrisPiece(2, 'O'), 3)
+
+    g2 = TetrisGame(width=6, bitboard=True)
+    g2.drop(TetrisPiece(2, 'O'), 3)
+    g2.drop(TetrisPiece(1, 'I1'), 0)
+
+    g3 = g2.copy()
+    g3.drop(TetrisPiece(1, 'I2'), 5)
+
+    assert_equals(g1.board_key(), g2.board_key())
+    assert_not_equal(g1.board_key(), g3.board_key())
+
+
+def test_transposition_table():
+    """ Test transposition table lookups are counted """
+
+    table = TranspositionTable()
+    assert_equals(table.lookup('a'), None)
+
+    table.store('a', 'child', 2.5)
+    assert_equals(table.lookup('a'), ('child', 2.5))
+    assert_equals((table.hits, table.misses), (1, 1))
+
+
+def test_transposition_moves():
+    """ Test solving with the transposition table makes the same moves as
+    without it, for pieces which reach the same boards in different orders """
+
+    numbers = [2, 2, 2, 2, 1, 1, 2, 2, 3, 5, 2, 2]
+    moves = {}
+
+    for use_table in [True, False]:
+        game = TetrisGame([TetrisPiece(n, i) for i, n in enumerate(numbers)],
+                          width=6)
+        weights = Weightings(backend='numpy', lookahead_distance=4,
+                             use_transposition_table=use_table)
+
+        moves[use_table] = [(m.num, m.rotation, m.left)
+                            for m in get_best_moves(game, weights)]
+
+    assert_equals(moves[True], moves[False])
+
+
+def test_move_cache():
+    """ Test the move cache evicts the least recently used stats """
+
+    cache = MoveCache(2)
+    cache.store('a', 1)
+    cache.store('b', 2)
+
+    # Use 'a', so 'b' is evicted next
+    assert_equals(cache.lookup('a'), 1)
+    cache.store('c', 3)
+
+    assert_equals(cache.lookup('b'), None)
+    assert_equals(cache.lookup('a'), 1)
+    assert_equals(cache.lookup('c'), 3)
+    assert_equals((cache.hits, cache.misses, cache.evictions), (3, 1, 1))
+
+
+def test_evaluators():
+    """ Test batched moves, and moves evaluated in worker processes, have
+    the same stats and cost as single moves """
+
+    weights = Weightings()
+
+    g = TetrisGame(width=4)
+    g.drop(TetrisPiece(2, 'O'), 0)
+    g.drop(TetrisPiece(3, 'T'), 2)
+    g.num_gaps = g.count_gaps()
+
+    # An I on its side fills the bottom row, so is removed completely
+    g2 = TetrisGame(width=4)
+
+    moves = []
+    for game in [g, g2]:
+        for num in [1, 4, 7]:
+            piece = TetrisPiece(num)
+            for rotation_id in range(4):
+                piece.rotate(rotation_id)
+                for left in range(game.width - piece.width + 1):
+                    moves.append(Move(game, piece, rotation_id, left))
+
+    for evaluator in [BatchEvaluator, ProcessEvaluator]:
+        evaluator = evaluator(weights, 2)
+        evaluator.evaluate(moves)
+        evaluator.close()
+
+        for move in moves:
+            evaluated_stats, evaluated_cost = move.stats, move.cost
+
+            move.try_dropping()
+            move.calculate_cost(weights)
+
+            assert_equals(evaluated_stats.__dict__, move.stats.__dict__)
+            assert_equals(evaluated_cost, move.cost)
+
+
+def start_step(game, search=True, **settings):
+    """ Returns the root Step of a search of the game's input_queue, and the
+    Weightings it was searched with, evaluating moves in this thread. The
+    Step is left unsearched unless search is True """
+
+    weights = Weightings(**settings)
+    weights.evaluator = BatchEvaluator(weights, 1)
+
+    start_search(weights)
+    step = Step(game, weights=weights, search=search)
+
+    return step, weights
+
+
+def test_step_extend():
+    """ Test extending a search tree searches the new piece after the others """
+
+    pieces = [TetrisPiece(1, 'I'), TetrisPiece(2, 'O'), TetrisPiece(3, 'T')]
+
+    game = TetrisGame(width=6)
+    game.input_queue = [pieces[1], pieces[0]]
+
+    step, weights = start_step(game)
+
+    start_search(weights)
+    step.extend([pieces[2]], weights)
+
+    # Follow the best moves down to the end of the tree
+    ids = []
+    while step.best_child:
+        step = step.best_child
+        ids.append(step.move.piece.id)
+
+    assert_equals(ids, ['I', 'O', 'T'])
+    assert_equals(step.depth, 3)
+
+
+def test_branch_and_bound():
+    """ Test branch and bound finds the cheapest moves of every move """
+
+    def cheapest(game, queue):
+        """ Lowest cost of placing queue, searching every move """
+        if not queue:
+            return 0
+
+        moves = get_possible_moves(game, queue[-1])
+        evaluate_moves(moves, weights)
+
+        costs = []
+        for move in moves:
+            new_game = game.copy()
+            new_game.drop(move.piece, move.left)
+            new_game.check_full_rows()
+            new_game.num_gaps = new_game.count_gaps()
+            costs.append(move.cost + cheapest(new_game, queue[:-1]))
+
+        return min(costs)
+
+    # The cheapest moves clear rows, so cost less than starting_score
+    game = TetrisGame(width=6)
+    game.drop(TetrisPiece(3, 'T'), 3)
+    game.num_gaps = game.count_gaps()
+
+    queue = [TetrisPiece(5, 'L'), TetrisPiece(6, 'S1'), TetrisPiece(6, 'S2')]
+
+    game.input_queue = list(queue)
+    step, weights = start_step(game, branch_and_bound=True)
+
+    game.input_queue = []
+    assert_almost_equal(step.best_cost, cheapest(game, queue))
+
+
+def test_prune_subtrees():
+    """ Test a pruned Step tree finds the same best moves as a full one,
+    while holding fewer Steps """
+
+    def best_path(prune_subtrees):
+        game = TetrisGame(width=6)
+        game.input_queue = [TetrisPiece(6, 'S2'), TetrisPiece(6, 'S1'),
+                            TetrisPiece(5, 'L'), TetrisPiece(3, 'T')]
+
+        step, weights = start_step(game, prune_subtrees=prune_subtrees,
+                                   step_counter=StepCounter())
+
+        path = []
+        while step.children:
+            path.append(step.best_cost)
+            step = step.best_child
+            path.append((step.move.piece.num, step.move.piece.rotation,
+                         step.move.left))
+
+        return path, weights.step_counter.peak
+
+    full_path, full_peak = best_path(False)
+    pruned_path, pruned_peak = best_path(True)
+
+    assert_equals(pruned_path, full_path)
+    assert pruned_peak < full_peak
+
+    # Solving as usual, with the transposition table, holds at most a
+    # couple of Steps per piece of lookahead in each window
+    def window_peaks(prune_subtrees):
+        numbers = [6, 6, 5, 3, 1, 2, 7, 4, 3, 5, 1, 2]
+        game = TetrisGame([TetrisPiece(n, i) for i, n in enumerate(numbers)],
+                          width=6)
+        counter = StepCounter()
+        weights = Weightings(backend='numpy', lookahead_distance=4,
+                             prune_subtrees=prune_subtrees,
+                             step_counter=counter)
+
+        peaks = [counter.peak for move in iter_best_moves(game, weights)]
+
+        # Every Step is counted out once the search's Weightings are freed
+        gc.collect()
+        assert_equals(counter.alive, 0)
+
+        return peaks
+
+    full_peaks = window_peaks(False)
+    pruned_peaks = window_peaks(True)
+
+    assert max(pruned_peaks) <= 4 * (4 + 1)
+    assert max(pruned_peaks) < max(full_peaks)
+
+
+def test_step_search():
+    """ Test a StepSearch can be stopped and carried on, and searches trees
+    deeper than the recursion limit """
+
+    def search(num_pieces, stop_times):
+        game = TetrisGame(width=6)
+        game.input_queue = [TetrisPiece(2, i) for i in range(num_pieces)]
+
+        step, weights = start_step(game, search=False, max_num_branches=1)
+        step_search = StepSearch(step, weights)
+
+        for stop_time in stop_times:
+            assert_false(step_search.run(stop_time))
+
+        assert_true(step_search.run())
+        assert_true(step_search.finished)
+
+        moves = []
+        while step.best_child:
+            step = step.best_child
+            moves.append((step.move.piece.id, step.move.left))
+
+        return moves
+
+    # Stopped before anything is searched, then carried on
+    expected = search(3, [])
+    assert_equals(search(3, [0, 0]), expected)
+    assert_equals([move[0] for move in expected], [2, 1, 0])
+
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(200)
+    try:
+        assert_equals(len(search(250, [])), 250)
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def test_merge_duplicate_moves():
+    """ Test moves giving the same game are merged, and have the same stats """
+
+    game = TetrisGame(width=5)
+    game.drop(TetrisPiece(2, 'O1'), 1)
+
+    piece = TetrisPiece(1, 'I')
+    piece.rotate(1)
+    game.drop(piece, 0)
+    game.drop(TetrisPiece(2, 'O2'), 3)
+    game.check_full_rows()
+    game.num_gaps = game.count_gaps()
+
+    # Off unless asked for, or solving with the beam
+    weights = Weightings(merge_duplicates=False)
+    moves = get_possible_moves(game, TetrisPiece(3, 'T'))
+    assert_true(merge_duplicate_moves(moves, weights) is moves)
+    assert_true(all(m.state_key is None for m in moves))
+
+    weights = Weightings(merge_duplicates=True)
+    unique_moves = merge_duplicate_moves(moves, weights)
+
+    assert_equals(len(unique_moves), len(moves) - 1)
+    assert_equals(weights.merged_moves, 1)
+
+    merged = [m for m in moves if m not in unique_moves][0]
+    kept = [m for m in unique_moves if m.state_key == merged.state_key][0]
+
+    merged.try_dropping()
+    kept.try_dropping()
+    assert_equals(merged.stats.__dict__, kept.stats.__dict__)
+
+
+def test_stream_pieces():
+    """ Test pieces read from a stream as they are needed give the same moves
+    as the whole queue """
+
+    numbers = [5, 4, 2, 1, 3, 6, 7]
+
+    game = TetrisGame([TetrisPiece(n, i) for i, n in enumerate(numbers)], width=6)
+    expected = get_best_moves(game, Weightings(backend='numpy'))
+
+    read = []
+
+    def stream():
+        for i, n in enumerate(numbers):
+            read.append(n)
+            yield TetrisPiece(n, i)
+
+    lookahead = Weightings.lookahead_distance
+    moves = iter_best_moves(TetrisGame(width=6),
+                            Weightings(backend='numpy'), stream())
+
+    # Only the lookahead is read before the first move
+    first = next(moves)
+    assert_equals(len(read), lookahead)
+
+    actual = [first] + list(moves)
+    assert_equals([(m.id, m.rotation, m.left) for m in actual],
+                  [(m.id, m.rotation, m.left) for m in expected])
+
+
+def test_beam_stream():
+    """ Test the beam solver makes each move from a stream within the
+    lookahead, without waiting for the beam to agree """
+
+    numbers = [5, 4, 2, 1, 3, 6, 7, 3, 3, 5, 1, 2, 6, 4]
+    read = []
+
+    def stream():
+        for i, n in enumerate(numbers):
+            read.append(n)
+            yield TetrisPiece(n, i)
+
+    lookahead = Weightings.lookahead_distance
+    weights = Weightings(solver='beam', backend='numpy')
+
+    moves = []
+    for move in iter_best_moves(TetrisGame(width=6), weights, stream()):
+        moves.append(move)
+        assert len(read) - len(moves) < lookahead
+
+    assert_equals([m.num for m in moves], numbers)
+
+    # Time limits only apply to the tree solver
+    for limits in [{'time_per_move': 1}, {'deadline': 10}]:
+        weights = Weightings(solver='beam', **limits)
+        game = TetrisGame([TetrisPiece(n, i) for i, n in enumerate(numbers)])
+        assert_raises(ValueError, get_best_moves, game, weights)
+
+
+def test_weightings_settings():
+    """ Test solver settings are given to Weightings, and solving doesn't
+    change them """
+
+    weights = Weightings(backend='numpy', lookahead_distance=2)
+    assert_equals(weights.backend, 'numpy')
+    assert_equals(weights.lookahead_distance, 2)
+    assert_equals(Weightings.lookahead_distance, 3)
+
+    assert_raises(TypeError, Weightings, lookahead=2)
+
+    game = TetrisGame([TetrisPiece(2, 'O'), TetrisPiece(1, 'I')], width=6)
+    get_best_moves(game, weights)
+
+    assert_false(hasattr(weights, 'evaluator'))
+    assert_equals(weights.transpositions, None)
+
+
+def test_move_record():
+    """ Test moves made are kept as compact records, without their game """
+
+    game = TetrisGame([TetrisPiece(2, 'O'), TetrisPiece(1, 'I')], width=6)
+    moves = get_best_moves(game, Weightings(backend='numpy'))
+
+    for move in moves:
+        assert_true(isinstance(move, MoveRecord))
+        assert_false(hasattr(move, '__dict__'))
+        assert_false(hasattr(move, 'game'))
+
+    assert_equals([(m.id, m.num) for m in moves], [('O', 2), ('I', 1)])
+    assert_equals(moves[0].stats.area, 4)
+
+
+def test_render_process():
+    """ Test games are plotted in the background """
+
+    filename = 'test/test_render_process.png'
+    if os.path.exists(filename):
+        os.remove(filename)
+
+    g = TetrisGame(width=6)
+    g.drop(TetrisPiece(2, 'O'), 0)
+
+    frame = g.frame()
+    renderer = RenderProcess()
+    renderer.plot(frame, filename)
+
+    # Playing on doesn't change the frame queued
+    g.drop(TetrisPiece(1, 'I'), 2)
+    assert_equals(len(frame.pieces), 1)
+
+    renderer.close()
+    assert_true(os.path.exists(filename))
+
+
+@raises(ValueError)
+def test_render_mode():
+    """ Test an unknown render mode is refused """
+    TetrisGame(render='sometimes')
+
+
+def test_raster_frame():
+    """ Test raster frames are the same drawn from bitboards or polygons,
+    and can be read back from PNG """
+
+    frames = []
+
+    for bitboard in [True, False]:
+        g = TetrisGame(width=6, bitboard=bitboard)
+        g.drop(TetrisPiece(2, 'O'), 0)
+        g.drop(TetrisPiece(3, 'T'), 3)
+        frames.append(render_frame(g, scale=10))
+
+    assert_equals(frames[0].shape, (80, 60, 3))
+    assert_true((frames[0] == frames[1]).all())
+
+    # Inside the O piece, in the bottom left
+    blended = 0.8 * np.array(hex_to_rgb(Pieces.piece_colours[2])) + 0.2 * 255
+    assert_true((frames[0][-5, 5] == blended.astype(np.uint8)).all())
+
+    save_frame(g, 'test/test_raster_frame')
+    image = pyplot.imread('test/test_raster_frame.png')
+    assert_true((np.round(image[:, :, :3] * 255) == render_frame(g)).all())
+
+
+def test_replay():
+    """ Test replaying the output of a game rebuilds the same game """
+
+    numbers = [5, 4, 2, 1, 3, 6, 7]
+
+    game = TetrisGame([TetrisPiece(n, i) for i, n in enumerate(numbers)], width=6)
+    game.solve(Weightings(backend='numpy'))
+
+    moves = [tuple(int(field) for field in line.split())
+             for line in game.get_output().split('\n')]
+
+    for replayed in replay(numbers, moves, width=6):
+        pass
+
+    assert_equals(replayed.board.rows, game.board.rows)
+
+    heights = [g.height for g in replay(numbers, moves, width=6)]
+    assert_equals(replay_height(numbers, moves, width=6), max(heights))
+
+    # Bad output files raise, as replaying them does
+    wrong_piece = [(moves[0][0] % 7 + 1,) + moves[0][1:]] + moves[1:]
+    assert_raises(ValueError, list, replay(numbers, wrong_piece, width=6))
+    assert_raises(ValueError, replay_height, numbers, wrong_piece, 6)
+
+    # The empty game, then a frame for each move
+    frames = list(render_replay(numbers, moves, width=6, scale=4))
+    assert_equals(len(frames), len(numbers) + 1)
+
+    # Only the pixels a move changed are written to a GIF
+    height, width = frames[0].shape
+    assert_equals(changed_box(None, frames[0]), (0, 0, height, width))
+    assert_equals(changed_box(frames[0], frames[0]), (0, 0, 1, 1))
+
+    top, left, bottom, right = changed_box(frames[0], frames[1])
+    assert_true((frames[0][:top] == frames[1][:top]).all())
+    assert_true((frames[0][bottom:] == frames[1][bottom:]).all())
+    assert_true((frames[0][:, right:] == frames[1][:, right:]).all())
+
+    # Three rows of three, with the last row padded
+    write_sprite_sheet('test/test_replay.png', iter(frames), len(frames),
+                       columns=3)
+    image = np.round(pyplot.imread('test/test_replay.png')[:, :, :3] * 255)
+    assert_equals(image.shape, (3 * height, 3 * width, 3))
+
+    palette = frame_palette()[0]
+    assert_true((image[2 * height:, :width] == palette[frames[6]]).all())
+    assert_true((image[2 * height:, 2 * width:] == 255).all())
+
+
+def test_validate_moves():
+    """ Test validating moves scores the same game as playing them, and
+    finds the first illegal move """
+
+    numbers = [5, 4, 2, 1, 3, 6, 7, 1, 1]
+
+    game = TetrisGame([TetrisPiece(n, i) for i, n in enumerate(numbers)], width=6)
+    game.solve(Weightings(backend='numpy'))
+
+    moves = [tuple(int(field) for field in line.split())
+             for line in game.get_output().split('\n')]
+
+    result = validate_moves(numbers, moves, width=6)
+    assert_true(result.valid)
+    assert_equals(result.height, game.height)
+
+    # Each row cleared removed 6 squares
+    placed = sum(TetrisPiece(n).polygon.area for n in numbers)
+    left = sum(bin(row).count('1') for row in game.board.rows)
+    assert_equals(result.rows_cleared * 6, placed - left)
+
+    # Out of bounds
+    result = validate_moves(numbers, moves[:3] + [(1, 0, 6)] + moves[4:], width=6)
+    assert_false(result.valid)
+    assert_equals(result.illegal_move, 3)
+    assert_equals(result.num_moves, 3)
+
+    # Wrong piece
+    result = validate_moves(numbers, moves[:1] + [(5, 0, 0)], width=6)
+    assert_equals(result.illegal_move, 1)
+
+    # Not every piece placed
+    result = validate_moves(numbers, moves[:-1], width=6)
+    assert_equals(result.illegal_move, None)
+    assert_false(result.valid)
+
+
+def test_validate_files():
+    """ Test a line of an output file which isn't a move is reported as
+    an illegal move, and the moves before it are still checked """
+
+    with open('test/test_validate_files_input.txt', 'w') as f:
+        f.write('1\n2\n3\n')
+
+    for lines, illegal_move, reason in [
+            (['1 0 0', '', '2 0'], 1, 'line 3 is not a move, expected 3 '
+             'numbers, found 2'),
+            (['1 0 0', '2 x 1'], 1, "line 2 is not a move, '2 x 1' is not "
+             "a whole number"),
+            (['1 0 0', '2 0 10', '2 0'], 1, 'left 10 is out of bounds')]:
+
+        with open('test/test_validate_files_output.txt', 'w') as f:
+            f.write('\n'.join(lines))
+
+        result = validate_files('test/test_validate_files_input.txt',
+                                'test/test_validate_files_output.txt')
+
+        assert_false(result.valid)
+        assert_equals(result.num_moves, 1)
+        assert_equals((result.illegal_move, result.reason),
+                      (illegal_move, reason))
+
+
 if __name__ == '__main__':
     nose.main(argv=['',
                     '--verbosity=2',
@@ -13,22 +13,25 @@
 #-------------------------------------------------------------------------
 #!/usr/bin/env python
 
-from copy import deepcopy
+from copy import copy
 import argparse
+import sys
 from pprint import pprint
 import os
 from time import clock, time
 # Choose higher resolution time counter
 time = clock if os.name == 'nt' else time
 
-from fileops import read_input_file, write_output_file
+from fileops import read_input_file, iter_input_numbers, write_output_lines
 
-from shapeops import get_shape_polygon, get_piece_colour
-from shapeops import merge, move, rotate, combine_split
+from shapeops import get_piece_colour
+from shapeops import merge, move, rotate, combine_split, get_polygon_rows
 from shapeops import get_row_box, get_single_box, get_height_box, get_box
+from shapeops import all_shapes_rectilinear, get_shape_catalog
+from bitboard import BitBoard, bottom_profile
 
-from plotting import plot_game
-from ai import get_best_moves, Weightings
+from plotting import RenderProcess, render_modes, plotters
+from ai import iter_best_moves, Weightings
 
 
 class TetrisGame(object):
@@ -40,10 +43,16 @@ class TetrisGame(object):
     pieces -- a list of TetrisPieces (Tetriminoes)
     width -- the game width
     max_buffer_size -- maximum number of TetrisPieces able to be held in a temporary buffer
+    bitboard -- hold the board as integer row bitmasks instead of polygons.
+                If None, used when every shape lies on the unit grid
+    render -- plot the game while solving - 'none', the 'final' game, or
+              'every-step'. Plots are saved in a background process
+    plotter -- plot with 'matplotlib', or the faster 'raster' frames
 
     """
 
-    def __init__(self, pieces=None, width=11, max_buffer_size=1):
+    def __init__(self, pieces=None, width=11, max_buffer_size=1, bitboard=None,
+                 render='none', plotter='matplotlib'):
         """Initialise the game board"""
 
         # Check piece ids are unique
@@ -54,6 +63,14 @@ class TetrisGame(object):
         self.input_queue.reverse()
         self.pieces = []
 
+        # Moves made by solving
+        self.moves = []
+
+        # Each (num, rotation, left) dropped, as a linked list of
+        # (placement, previous placements) - shared between copies
+        self.placements = None
+        self.record_placements = True
+
         # Game width
         self.width = width
 
@@ -66,13 +83,42 @@ class TetrisGame(object):
         # Game status for plot title
         self.status = "Tetris"
 
+        # When to plot the game while solving - see plotting.render_modes
+        if render not in render_modes:
+            raise ValueError("Unknown render mode {}".format(render))
+        self.render = render
+
+        if plotter not in plotters:
+            raise ValueError("Unknown plotter {}".format(plotter))
+        self.plotter = plotter
+
+        # Rectilinear shapes can be held as a grid of bits, which is much
+        # faster than polygon operations
+        if bitboard is None:
+            bitboard = all_shapes_rectilinear()
+
+        self.board = BitBoard(width) if bitboard else None
+
         # Merge all pieces together into one polygon
         self.update_merged_pieces()
 
-    def solve(self, num_threads=None):
+    def solve(self, weights=None):
         """Attempt to solve the game.
 
         Will move pieces from input_queue to pieces one by one.
+
+        Keyword arguments:
+        weights -- the Weightings to solve with, which also hold the
+                   settings of the solver. Defaults to Weightings()
+
+        """
+        for move in self.iter_solve(weights):
+            pass
+
+    def iter_solve(self, weights=None):
+        """Attempt to solve the game, yielding a MoveRecord of each move as
+        soon as it has been decided and made. Takes the same arguments as
+        solve().
         """
 ##        print 'Starting to solve'
 ##        print 'Number of pieces in input_queue:', len(self.input_queue)
@@ -80,44 +126,66 @@ class TetrisGame(object):
         index = 0
 
         # Make a copy of the empty game state
-        gamecopy = deepcopy(self)
+        gamecopy = self.copy()
 
         # Dictionary of pieces by ID
         pieces = {p.id: p for p in self.input_queue}
 
         # Run the main artificial intelligence function
-        moves = get_best_moves(gamecopy, num_threads)
+        moves = iter_best_moves(gamecopy, weights)
 
-        # Store moves
-        self.moves = moves
+        every_step = self.render == 'every-step'
+        if self.render != 'none':
+            renderer = RenderProcess(self.plotter)
+        else:
+            renderer = None
 
-        for move in moves:
-            piece_id = move.piece.id
-            piece_rotation = move.piece.rotation
-            piece_left = move.left
+        try:
+            for move in moves:
+                piece_id = move.id
+                piece_rotation = move.rotation
+                piece_left = move.left
 
-            # Get piece by it's ID
-            piece = pieces.get(piece_id)
+                # Get piece by it's ID
+                piece = pieces.get(piece_id)
 
-            # Rotate then drop it
-            piece.rotate(piece_rotation)
-            self.drop(piece, left=piece_left)
+                # Rotate then drop it
+                piece.rotate(piece_rotation)
+                self.drop(piece, left=piece_left)
 
-            # Plot before removing rows
-            plot_game(self, '{}_step_{}'.format(self.status, index))
+                # Plot before removing rows
+                if every_step:
+                    renderer.plot(self.frame(),
+                                  '{}_step_{}'.format(self.status, index))
 
-            # Plot after removing rows (if needed)
-            rows_removed = self.check_full_rows()
-            if rows_removed > 0:
-                plot_game(self, '{}_step_{}b'.format(self.status, index))
+                # Plot after removing rows (if needed)
+                rows_removed = self.check_full_rows()
+                if rows_removed > 0 and every_step:
+                    renderer.plot(self.frame(),
+                                  '{}_step_{}b'.format(self.status, index))
 
-            index += 1
+                index += 1
 
-        self.update_merged_pieces()
-        self.height = self.calculate_height()
+                # Store move
+                self.moves.append(move)
+
+                yield move
+
+            self.update_merged_pieces()
+            self.height = self.calculate_height()
+
+            if self.render == 'final':
+                renderer.plot(self.frame(), '{}_final'.format(self.status))
+
+        finally:
+            if renderer is not None:
+                renderer.close()
 
     def calculate_height(self):
         """Returns the max number of blocks from the bottom"""
+        if self.board is not None:
+            return self.board.height
+
         if self.merged_pieces.is_empty:
             return 0
 
@@ -134,6 +202,21 @@ class TetrisGame(object):
         if piece.width + left > self.width:
             raise ValueError("Piece {0.id} is out of bounds".format(piece))
 
+        if self.record_placements:
+            self.placements = ((piece.num, piece.rotation, left),
+                               self.placements)
+
+        if self.board is not None:
+            bottom = self.board.drop_position(piece.rows, left,
+                                              piece.bottom_profile)
+            piece.move_to(left, bottom)
+
+            self.pieces.append(piece)
+
+            self.board.place(piece.rows, left, bottom)
+            self.height = self.board.height
+            return
+
         piece.left = left
         piece.bottom = self.height
 
@@ -148,14 +231,94 @@ class TetrisGame(object):
 
         self.pieces.append(piece)
 
-        self.update_merged_pieces()
+        # Add only the new piece to the merged pieces
+        self.merged_pieces = self.merged_pieces.union(piece.polygon)
         self.height = self.calculate_height()
 
+    def copy(self):
+        """Return a copy of the game which moves can be played on.
+
+        Placed pieces are shared between the copies, and are only copied
+        when they need to change (see remove_full_row). Much cheaper than
+        a deepcopy of every polygon.
+        """
+        game = copy(self)
+
+        game.input_queue = list(self.input_queue)
+        game.pieces = list(self.pieces)
+
+        if self.board is not None:
+            game.board = self.board.copy()
+
+        return game
+
+    def snapshot(self):
+        """Return a compact copy of the game, with enough to evaluate moves.
+
+        With a bitboard only the last piece is kept, for the centroid of the
+        last placed piece. Polygon games keep every piece, as the pieces
+        are merged again when rows are removed.
+        """
+        game = self.copy()
+        game.input_queue = []
+
+        if self.board is not None:
+            game.pieces = self.pieces[-1:]
+
+        return game
+
+    def frame(self):
+        """Return a copy of the game with just what is needed to plot it,
+        which isn't changed by playing on"""
+        game = self.copy()
+        game.input_queue = []
+        game.moves = []
+        game.placements = None
+
+        return game
+
+    def board_key(self):
+        """Return a hashable key for the filled squares of the board"""
+        if self.board is not None:
+            return tuple(self.board.rows)
+
+        return self.merged_pieces.wkb
+
     def get_output(self):
-        return "\n".join(["{0.num} {0.rotation} {0.left:.0f}".format(m.piece) for m in self.moves])
+        return "\n".join(self.iter_output())
+
+    def iter_output(self):
+        """ Yields a line of output for each piece dropped, first to last """
+        placements = []
+
+        node = self.placements
+        while node is not None:
+            placement, node = node
+            placements.append(placement)
+
+        for placement in reversed(placements):
+            yield format_placement(*placement)
 
     def update_merged_pieces(self):
-        self.merged_pieces = merge(self.pieces)
+        """Rebuild the board from the placed pieces"""
+        if self.board is not None:
+            self.board = BitBoard(self.width)
+            for piece in self.pieces:
+                self.board.place(piece.rows, piece.left, piece.bottom)
+        else:
+            self.merged_pieces = merge(self.pieces)
+
+    def update_merged_pieces_above(self, height):
+        """Rebuild the merged pieces above height, keeping what lies below"""
+        # Pieces reaching above height may have been split or moved
+        pieces_above = [p for p in self.pieces if p.polygon.bounds[3] > height]
+
+        if height > 0:
+            below = self.merged_pieces.intersection(
+                get_height_box(self.width, height))
+            self.merged_pieces = below.union(merge(pieces_above))
+        else:
+            self.merged_pieces = merge(pieces_above)
 
     def check_full_rows(self):
         """Checks if any rows are full of pieces"""
@@ -171,7 +334,10 @@ class TetrisGame(object):
         for row_id in full_rows[::-1]:
             self.remove_full_row(row_id)
 
-        self.update_merged_pieces()
+        # The bitboard removes its own rows
+        if full_rows and self.board is None:
+            self.update_merged_pieces_above(full_rows[0])
+
         self.height = self.calculate_height()
 
         # Return number of rows removed
@@ -179,6 +345,9 @@ class TetrisGame(object):
 
     def is_row_full(self, height):
         """ Returns whether a row is completely full of pieces """
+        if self.board is not None:
+            return self.board.is_row_full(height)
+
         row = get_row_box(self.width, height)
         return row.intersection(self.merged_pieces).area == row.area
 
@@ -186,28 +355,49 @@ class TetrisGame(object):
         # Find out which shapes intersect this row and split them
         row = get_row_box(self.width, row_id)
 
+        if self.board is not None:
+            self.board.remove_row(row_id)
+
         pieces_to_remove = []
 
         for index, piece in enumerate(self.pieces):
             # Split piece if it intersects row
-            if piece.intersects(row):
+            if self.piece_intersects_row(piece, row, row_id):
+                # Pieces may be shared with copies of this game
+                piece = self.pieces[index] = piece.copy()
                 split_status = piece.split(row)
 
                 if split_status == 'remove':
                     pieces_to_remove.append(piece)
 
             # Shift pieces above row down by one
-            elif piece.polygon.centroid.y > row_id:
+            elif self.piece_above_row(piece, row_id):
+                piece = self.pieces[index] = piece.copy()
                 piece.bottom -= 1
 
         # Remove all empty pieces
         for piece in pieces_to_remove:
             self.pieces.remove(piece)
 
+    def piece_intersects_row(self, piece, row, row_id):
+        """ Returns whether piece has any blocks in the row """
+        if self.board is not None:
+            return piece.covers_row(row_id)
+
+        return piece.intersects(row)
+
+    def piece_above_row(self, piece, row_id):
+        """ Returns whether a piece not intersecting the row lies above it """
+        if self.board is not None:
+            return piece.bottom > row_id
+
+        return piece.polygon.centroid.y > row_id
+
     def count_gaps(self):
         # Count the gaps which cannot be filled by dropping a piece
 
-        self.update_merged_pieces()
+        if self.board is not None:
+            return self.board.count_gaps()
 
         # If no blocks yet
         if self.merged_pieces.is_empty:
@@ -243,6 +433,9 @@ class TetrisGame(object):
     def calculate_blocks_above_height(self, height):
         """ Returns a tuple of centroid, and area of blocks above height """
 
+        if self.board is not None:
+            return self.board.blocks_above_height(height)
+
         # If no blocks yet
         if self.merged_pieces.is_empty:
             return 0, 0
@@ -294,10 +487,19 @@ class TetrisPiece(object):
         self._left = 0
         self._bottom = 0
 
+        # Precalculated geometry of each rotation of the shape, and the
+        # one currently in use. Both None once the piece has been split
+        self.shapes = get_shape_catalog().rotations[self.num]
+        self.shape = self.shapes[0]
+
         # Piece shape and colour
-        self.polygon = get_shape_polygon(self.num)
+        self.polygon = self.shape.polygon
         self.colour = get_piece_colour(self.num)
 
+        # Row bitmasks and bottom profile - see .rows
+        self._rows = None
+        self._bottom_profile = None
+
         # Rotation - 0=0, 1=90, 2=180, 3=270
         self._rotation = 0
         self.rotation = rotation
@@ -354,11 +556,34 @@ class TetrisPiece(object):
         if angle_id not in range(0, 4):
             raise ValueError("Invalid angle id, must be one of 0, 1, 2 or 3")
 
+        # A split piece is no longer one of the precalculated shapes
+        if self.shapes is None:
+            self.rotate_polygon(angle_id)
+            return
+
+        # Use the precalculated rotation, moved to the piece's position
+        self.shape = self.shapes[angle_id]
+        self._rotation = angle_id
+
+        if self.left or self.bottom:
+            self.polygon = move(self.shape.polygon, self.left, self.bottom)
+        else:
+            self.polygon = self.shape.polygon
+
+        self._rows = self.shape.rows
+        self._bottom_profile = self.shape.bottom_profile
+
+    def rotate_polygon(self, angle_id):
+        """Rotate the piece's polygon about the origin into rotation
+        position 0,1,2,3, keeping its bottom left corner in place"""
+
         # Difference in angle
         angle_diff = angle_id * 90 - self._rotation * 90
 
         # Rotate polygon
         self.polygon = rotate(self.polygon, angle_diff)
+        self._rows = None
+        self._bottom_profile = None
 
         # Set rotation attribute
         self._rotation = angle_id
@@ -384,6 +609,9 @@ class TetrisPiece(object):
     @property
     def width(self):
         """Calculate polygon width"""
+        if self.shape is not None:
+            return self.shape.width
+
         if self.polygon.is_empty:
             raise ValueError("Piece is empty. Why are you here?")
 
@@ -393,12 +621,41 @@ class TetrisPiece(object):
     @property
     def height(self):
         """Calculate polygon height"""
+        if self.shape is not None:
+            return self.shape.height
+
         if self.polygon.is_empty:
             raise ValueError("Piece is empty. Why are you here?")
 
         x_min, y_min, x_max, y_max = self.polygon.bounds
         return int(y_max - y_min)
 
+    @property
+    def rows(self):
+        """Row bitmasks of the squares the piece covers, from its bottom row up"""
+        if self._rows is None:
+            self._rows = get_polygon_rows(self.polygon)
+
+        return self._rows
+
+    @property
+    def bottom_profile(self):
+        """Row of the lowest square in each column, relative to the bottom"""
+        if self._bottom_profile is None:
+            self._bottom_profile = bottom_profile(self.rows)
+
+        return self._bottom_profile
+
+    def covers_row(self, row_id):
+        """ Returns whether any of the piece's squares are in the row """
+        index = int(row_id - self.bottom)
+        return 0 <= index < len(self.rows) and self.rows[index] != 0
+
+    def copy(self):
+        """Return a copy of the piece which can be moved independently.
+        Polygons and shapes are never changed in place, so are shared"""
+        return copy(self)
+
     def intersects(self, other):
         """ Returns whether this piece intersects the other """
         return self.polygon.intersection(other).area != 0
@@ -416,7 +673,17 @@ class TetrisPiece(object):
         """
         shape = self.polygon.difference(row)
 
-        if shape.type == 'MultiPolygon':
+        # No longer one of the precalculated shapes
+        self.shapes = None
+        self.shape = None
+        self._rows = None
+        self._bottom_profile = None
+
+        if shape.is_empty:
+            # Nothing left to move
+            pass
+
+        elif shape.type == 'MultiPolygon':
             # Combine multiple geoms into one
             shape = combine_split(shape)
 
@@ -442,11 +709,20 @@ class TetrisPiece(object):
         return str(self)
 
 
+def format_placement(num, rotation, left):
+    """ Returns the line of output for a piece dropped """
+    return "{} {} {:.0f}".format(num, rotation, left)
+
+
 def solve_from_input_file(input_filename, output_filename=None,
-                          print_stats=False, num_threads=None):
+                          print_stats=False, weights=None, render='none',
+                          plotter='matplotlib'):
 
     start_time = time()
 
+    if weights is None:
+        weights = Weightings()
+
     # Parse input file
     piece_numbers = read_input_file(input_filename)
 
@@ -454,13 +730,31 @@ def solve_from_input_file(input_filename, output_filename=None,
     pieces = [TetrisPiece(n, i) for i, n in enumerate(piece_numbers)]
 
     # Initialise game with list of pieces
-    game = TetrisGame(pieces)
+    game = TetrisGame(pieces, render=render, plotter=plotter)
 
     print '{} pieces loaded'.format(len(piece_numbers))
-    print 'This will take approximately {} seconds. Sorry!'.format(len(piece_numbers) * 5)
+    limits = []
+    if weights.time_per_move is not None:
+        limits.append(len(piece_numbers) * weights.time_per_move)
+    if weights.deadline is not None:
+        limits.append(weights.deadline)
+
+    if limits:
+        print 'This will take at most about {} seconds.'.format(min(limits))
+    else:
+        print ('This will take approximately {} seconds. Use --time-per-move '
+               'or --deadline to bound it.'.format(len(piece_numbers) * 5))
 
     # Solve game
-    game.solve(num_threads)
+    moves = game.iter_solve(weights)
+
+    if output_filename:
+        # Write each move as soon as it has been made
+        lines = (format_placement(m.num, m.rotation, m.left) for m in moves)
+        write_output_lines(output_filename, lines)
+    else:
+        for move in moves:
+            pass
 
     print 'Solving complete!'
     print 'Time taken: {:.2f}s'.format(time() - start_time)
@@ -470,7 +764,7 @@ def solve_from_input_file(input_filename, output_filename=None,
         print '-' * 40
         print 'Cost function weightings:'
         print '-' * 40
-        print Weightings()
+        print weights
 
         print '-' * 40
         print 'Detailed statistics:'
@@ -480,36 +774,164 @@ def solve_from_input_file(input_filename, output_filename=None,
             print move
             pprint(move.stats)
 
-    if output_filename:
-        # Write output of game moves
-        write_output_file(output_filename, game.get_output())
-    else:
+    if not output_filename:
         print '-' * 40
         print 'Game output:'
         print '-' * 40
         print game.get_output()
 
 
+def solve_from_stream(stream, weights=None):
+    """Play the pieces of a stream as they arrive, writing each move to
+    stdout as soon as it has been made.
+
+    Only the lookahead is held in memory, so the stream can run for any
+    length of time. Everything else is printed to stderr.
+    """
+
+    output = sys.stdout
+    sys.stdout = sys.stderr
+
+    try:
+        # Convert numbers to Tetris piece objects as they are read
+        numbers = iter_input_numbers(stream)
+        pieces = (TetrisPiece(n, i) for i, n in enumerate(numbers))
+
+        moves = iter_best_moves(TetrisGame(), weights, pieces)
+
+        for move in moves:
+            output.write(format_placement(move.num, move.rotation,
+                                          move.left) + '\n')
+            output.flush()
+
+    finally:
+        sys.stdout = output
+
+
+solver_options = ['num_workers', 'backend', 'move_cache_size', 'solver',
+                  'beam_width', 'time_per_move', 'deadline',
+                  'branch_and_bound', 'prune_subtrees', 'print_stats']
+""" Command line options which are settings of the solver's Weightings """
+
+
+def weightings_from_args(args):
+    """ Returns Weightings holding the solver options given on the
+    command line """
+    weights = Weightings()
+
+    for name in solver_options:
+        value = getattr(args, name)
+        if value is not None:
+            setattr(weights, name, value)
+
+    return weights
+
+
 def parse_commandline_args():
     parser = argparse.ArgumentParser(description='Tetris-AI')
 
-    parser.add_argument('input', type=str,
+    parser.add_argument('input', type=str, nargs='?', default=None,
                         help='the input filename containing Tetris piece IDs')
 
     parser.add_argument('output', type=str, nargs='?', default=None,
-                        help="""the output filename to write moves to.
-        if this argument is missing, the program prints the moves to stdout.""")
+                        help="""the output filename to write moves to, as
+        each is made. if this argument is missing, the program prints the
+        moves to stdout.""")
 
-    parser.add_argument('--stats', dest='stats', action="store_true",
-                        help='Show detailed statistics on game end state, moves and costs.')
+    parser.add_argument('--stats', dest='print_stats', action="store_true",
+                        help="""Show detailed statistics on the search, game end
+        state, moves and costs.""")
 
-    parser.add_argument('--threads', dest='threads', type=int, default=None,
-                        help="""Number of threads to spawn. If argument missing,
+    parser.add_argument('--threads', dest='num_workers', type=int,
+                        default=None, metavar='THREADS',
+                        help="""Number of threads or processes to spawn. If argument missing,
         program will automatically detect the number of CPU cores.""")
 
+    parser.add_argument('--backend', dest='backend', default='threads',
+                        choices=['threads', 'processes', 'numpy'],
+                        help="""Evaluate moves in worker threads, in worker
+        processes to make use of every core, or in batches with NumPy.""")
+
+    parser.add_argument('--cache-size', dest='move_cache_size', type=int,
+                        default=None, metavar='CACHE_SIZE',
+                        help="""Number of move results to remember between search
+        windows. 0 disables the cache.""")
+
+    parser.add_argument('--solver', dest='solver', default='tree',
+                        choices=['tree', 'beam'],
+                        help="""Search a pruned tree of moves a few pieces ahead,
+        or search every piece with a beam of the best games.""")
+
+    parser.add_argument('--beam-width', dest='beam_width', type=int, default=None,
+                        help="""Number of games kept at each depth by the beam
+        solver. Wider beams are slower, but find better moves.""")
+
+    parser.add_argument('--time-per-move', dest='time_per_move', type=float,
+                        default=None,
+                        help="""Seconds to spend searching for each move. The
+        lookahead is deepened one piece at a time, using the deepest search
+        finished in time.""")
+
+    parser.add_argument('--deadline', dest='deadline', type=float, default=None,
+                        help="""Seconds in which to find every move, shared between
+        the pieces left.""")
+
+    parser.add_argument('--branch-and-bound', dest='branch_and_bound',
+                        action='store_true', default=None,
+                        help="""Search every move, cutting only moves which can't
+        beat the best found. Finds the cheapest moves in each lookahead
+        window, but takes longer. Turns off the transposition table, and
+        evaluating sibling moves together with --backend processes.""")
+
+    parser.add_argument('--prune-subtrees', dest='prune_subtrees',
+                        action='store_true', default=None,
+                        help="""Keep only the best move below each move searched,
+        freeing the rest as soon as their costs are known. Bounds memory at
+        long lookaheads, but each window's tree is searched afresh, and the
+        transposition table and evaluating sibling moves together with
+        --backend processes are turned off.""")
+
+    parser.add_argument('--render', dest='render', default='none',
+                        choices=render_modes,
+                        help="""Plot the game to PNG files - not at all, once
+        solved, or after every move. Plots are saved in the background, so
+        don't slow down solving.""")
+
+    parser.add_argument('--plotter', dest='plotter', default='matplotlib',
+                        choices=sorted(plotters),
+                        help="""Plot with matplotlib, or draw raster frames
+        without axes or labels - much faster for many frames.""")
+
+    parser.add_argument('--stdin', dest='stdin', action='store_true',
+                        help="""Read piece IDs from stdin as they arrive instead
+        of an input file, and print each move to stdout as soon as it is made.
+        Memory use doesn't grow with the number of pieces.""")
+
     args = parser.parse_args()
 
-    solve_from_input_file(args.input, args.output, args.stats, args.threads)
+    if args.solver == 'beam' and (args.time_per_move is not None or
+                                  args.deadline is not None):
+        parser.error('--time-per-move and --deadline only apply to '
+                     '--solver tree')
+
+    if args.stdin:
+        if args.input is not None or args.print_stats or \
+                args.render != 'none':
+            parser.error('--stdin takes no input or output files, --stats '
+                         'or --render')
+        if args.deadline is not None:
+            parser.error('--deadline needs the number of pieces, use '
+                         '--time-per-move with --stdin')
+
+        solve_from_stream(sys.stdin, weightings_from_args(args))
+        return
+
+    if args.input is None:
+        parser.error('an input file is needed, or --stdin')
+
+    solve_from_input_file(args.input, args.output, args.print_stats,
+                          weightings_from_args(args), args.render,
+                          args.plotter)
 
 if __name__ == '__main__':
     parse_commandline_args()
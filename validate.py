@@ -0,0 +1,224 @@
+#-------------------------------------------------------------------------
+# Name:        Tetris Validate
+# Purpose:     Check the moves of an output file against its input file,
+#              and score the game they make
+#
+# Version:     Python 2.7
+#
+# Author:      Tetris-AI contributors
+#
+# Created:     18/10/2026
+# Copyright:   (c) Tetris-AI contributors 2026
+# Licence:     MIT
+#-------------------------------------------------------------------------
+#!/usr/bin/env python
+
+import argparse
+import sys
+
+from fileops import read_piece_ids, read_output_moves
+from shapeops import get_shape_catalog
+from bitboard import column_heights
+
+"""
+Replays the moves of an output file on a grid of row bitmasks, as BitBoard
+does, but without TetrisGame, TetrisPiece or the AI. Each rotation of each
+shape is looked up once, so only a few integer operations are done per move.
+
+Only shapes which lie on the unit grid can be validated.
+
+"""
+
+
+class Validation(object):
+
+    """Hold the result of replaying a game's moves.
+
+    Keyword arguments:
+    num_pieces -- the number of pieces in the input
+
+    """
+
+    def __init__(self, num_pieces):
+        self.num_pieces = num_pieces
+        self.num_moves = 0
+        self.height = 0
+
+        # Most rows filled after any move, once full rows are removed
+        self.max_height = 0
+        self.rows_cleared = 0
+
+        # Index of the first illegal move, and why it's illegal
+        self.illegal_move = None
+        self.reason = None
+
+    @property
+    def valid(self):
+        """Whether every piece was placed by a legal move"""
+        return self.illegal_move is None and self.num_moves == self.num_pieces
+
+    def __str__(self):
+        lines = [
+            'Moves: {0.num_moves} of {0.num_pieces} pieces'.format(self),
+            'Final game height: {}'.format(self.height),
+            'Rows cleared: {}'.format(self.rows_cleared),
+        ]
+
+        if self.illegal_move is not None:
+            lines.append('First illegal move: {} - {}'.format(
+                self.illegal_move + 1, self.reason))
+        elif self.num_moves < self.num_pieces:
+            lines.append('{} pieces were not placed'.format(
+                self.num_pieces - self.num_moves))
+
+        lines.append('Valid' if self.valid else 'Invalid')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return str(self)
+
+
+def shape_table():
+    """ Return a dictionary of (width, rows, profile, tops) by (piece number,
+    rotation), for every rotation of every shape.
+
+    profile is (column, offset of the lowest square) and tops is (column,
+    height of the highest square) for each column the shape covers.
+    """
+    table = {}
+
+    for num, rotations in get_shape_catalog().rotations.items():
+        for rotation, shape in enumerate(rotations):
+            if shape.rows is None:
+                raise ValueError("Shape {} isn't on the unit grid".format(num))
+
+            profile = [(column, offset)
+                       for column, offset in enumerate(shape.bottom_profile)
+                       if offset is not None]
+            tops = list(enumerate(column_heights(shape.rows, shape.width)))
+
+            table[num, rotation] = (shape.width, shape.rows, profile, tops)
+
+    return table
+
+
+def validate_moves(piece_numbers, moves, width=11):
+    """ Replay moves on the pieces, stopping at the first illegal move.
+    Returns a Validation.
+
+    Keyword arguments:
+    piece_numbers -- the pieces, as read by read_piece_ids
+    moves -- (piece number, rotation, left) of each move, in order, as read
+             by read_output_moves
+    width -- the game width
+
+    """
+    result = Validation(len(piece_numbers))
+    table = shape_table()
+
+    full_row = (1 << width) - 1
+    rows = []
+    skyline = [0] * width
+    rows_cleared = 0
+
+    for index, move in enumerate(moves):
+        num, rotation, left = move
+
+        if index >= len(piece_numbers):
+            result.illegal_move = index
+            result.reason = 'there are no pieces left'
+            break
+
+        if num != piece_numbers[index]:
+            result.illegal_move = index
+            result.reason = 'piece number {} should be {}'.format(
+                num, piece_numbers[index])
+            break
+
+        shape = table.get((num, rotation))
+        if shape is None:
+            result.illegal_move = index
+            result.reason = 'rotation {} is not 0, 1, 2 or 3'.format(rotation)
+            break
+
+        shape_width, shape_rows, profile, tops = shape
+
+        if left < 0 or left + shape_width > width:
+            result.illegal_move = index
+            result.reason = 'left {} is out of bounds'.format(left)
+            break
+
+        # Land on whichever column first meets the bottom of the piece
+        bottom = 0
+        for column, offset in profile:
+            landing = skyline[left + column] - offset
+            if landing > bottom:
+                bottom = landing
+
+        top = bottom + len(shape_rows)
+        if top > len(rows):
+            rows.extend([0] * (top - len(rows)))
+
+        for row_id, mask in enumerate(shape_rows, bottom):
+            rows[row_id] |= mask << left
+
+        for column, height in tops:
+            if height:
+                skyline[left + column] = bottom + height
+
+        # Only rows the piece covers can be full
+        full = [row_id for row_id in xrange(bottom, top)
+                if rows[row_id] == full_row]
+
+        if full:
+            for row_id in reversed(full):
+                del rows[row_id]
+
+            rows_cleared += len(full)
+            skyline = column_heights(rows, width)
+
+        result.max_height = max(result.max_height, len(rows))
+        result.num_moves += 1
+
+    result.height = len(rows)
+    result.rows_cleared = rows_cleared
+
+    return result
+
+
+def validate_files(input_filename, output_filename, width=11):
+    """ Validate the moves of an output file against its input file.
+    A line which isn't a move is illegal, as are the moves after it """
+
+    moves, error = read_output_moves(output_filename)
+    result = validate_moves(read_piece_ids(input_filename), moves, width)
+
+    if error is not None and result.illegal_move is None:
+        result.illegal_move = len(moves)
+        result.reason = 'line {} is not a move, {}'.format(*error)
+
+    return result
+
+
+def parse_commandline_args():
+    parser = argparse.ArgumentParser(description='Tetris-AI validate')
+
+    parser.add_argument('input', type=str,
+                        help='the input filename containing Tetris piece IDs')
+
+    parser.add_argument('output', type=str,
+                        help='the output filename containing the moves made')
+
+    parser.add_argument('--width', dest='width', type=int, default=11,
+                        help='Width of the game the moves were made in.')
+
+    args = parser.parse_args()
+
+    result = validate_files(args.input, args.output, args.width)
+    print result
+
+    # Exit with an error if the moves are invalid
+    sys.exit(0 if result.valid else 1)
+
+if __name__ == '__main__':
+    parse_commandline_args()